@@ -2,27 +2,30 @@ import hashlib
 import os
 import pickle
 import io
-import fitz
-import faiss
-import docx
 import tempfile
 import base64
-import ollama
-from flask import Flask, Response, request, jsonify, stream_with_context, json, send_from_directory
+from flask import Flask, Response, request, jsonify, stream_with_context, json, send_file, send_from_directory
 from flask_cors import CORS
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_ollama.chat_models import ChatOllama
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from faster_whisper import WhisperModel
-import pytesseract
 from PIL import Image
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 import threading
-from transformers import BlipProcessor, BlipForConditionalGeneration
+import time
+import shutil
+import bisect
+import copy
+import heapq
+import math
+import re
+from collections import defaultdict
+from contextlib import contextmanager
 from werkzeug.utils import secure_filename
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+# ✨ OPTIMIZATION: Heavy libraries (torch/transformers, sentence_transformers, faster_whisper,
+# langchain, faiss, fitz, docx, pytesseract, ollama) are imported inside the code paths that
+# use them, so the server answers the health check within a second of starting.
+# Check with: python benchmarks/startup_latency.py
 
 # --- App Initialization ---
 app = Flask(__name__, static_folder='temp', static_url_path='/temp')
@@ -39,11 +42,35 @@ CORS(app, resources={
 # --- Global Variables & Model Loading ---
 all_documents_metadata = []
 vector_store = None
+stored_vectors = None  # VectorShards with the (cache-precision) vectors behind vector_store
+lexical_index = None  # BM25Index over the same documents, built incrementally on upload
 session_uploaded_files = set()
 session_file_hashes = {}
 session_file_indices = {}
 CACHE_DIR = "cache"
 
+# ✨ OPTIMIZATION: Compressed vector storage for large corpora. The live index holds
+# float32 (flat), float16 or int8 (scalar quantization) or PQ codes; compressed modes
+# over-fetch RESCORE_FACTOR x k candidates and re-score them against the cached vectors,
+# which stay on disk (memory-mapped) as float16 instead of in RAM.
+VECTOR_STORAGE_MODES = ("float32", "float16", "int8", "pq")
+VECTOR_STORAGE = os.environ.get("VECTOR_STORAGE", "float32")
+CACHE_VECTOR_DTYPE = np.float32 if VECTOR_STORAGE == "float32" else np.float16
+RESCORE_FACTOR = int(os.environ.get("RESCORE_FACTOR", 4))
+PQ_SUBQUANTIZERS = int(os.environ.get("PQ_SUBQUANTIZERS", 48))  # must divide the dimension (384)
+PQ_MIN_TRAINING_VECTORS = int(os.environ.get("PQ_MIN_TRAINING_VECTORS", 1024))
+
+# ✨ OPTIMIZATION: Hybrid retrieval. BM25 and vector hits are merged with reciprocal rank
+# fusion and only the top RERANK_BUDGET candidates go through the CrossEncoder.
+RERANK_BUDGET = int(os.environ.get("RERANK_BUDGET", 8))
+LEXICAL_K = int(os.environ.get("LEXICAL_K", 10))
+BM25_MAX_DF = float(os.environ.get("BM25_MAX_DF", 0.5))  # skip query terms in more than this share of chunks
+RRF_K = 60
+
+# Multi-worker serving (see gunicorn.conf.py): workers map the published index read-only
+SHARED_INDEX = os.environ.get("SHARED_INDEX", "0") == "1"
+INDEX_DIR = os.environ.get("INDEX_DIR", "index")
+
 # ✨ OPTIMIZATION: Lazy loading of models to reduce startup time
 _embedding_model = None
 _reranker = None
@@ -51,90 +78,440 @@ _whisper_model = None
 _ex_llm = None
 _llm = None
 _vision_llm = None
-_model_lock = threading.Lock()
 
 _blip_processor = None
 _blip_model = None
 
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+RERANKER_MODEL_NAME = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+WHISPER_MODEL_NAME = "base.en"
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-large"
+LLM_MODEL_NAME = "llama3.2"
+EX_LLM_MODEL_NAME = "gemma3:1b"
+VISION_LLM_MODEL_NAME = "gemma3:4b"
+
+# ✨ OPTIMIZATION: Pluggable CPU inference backends for the embedding model and reranker:
+# torch (fp32), torch-int8 (dynamic quantization), onnx, onnx-int8 (pre-quantized ONNX file).
+# The CrossEncoder ONNX backends need sentence-transformers >= 4.1.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+RERANKER_BACKEND = os.environ.get("RERANKER_BACKEND", "torch")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 32))
+RERANKER_BATCH_SIZE = int(os.environ.get("RERANKER_BATCH_SIZE", 32))
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", 0))  # 0 keeps the library default
+ONNX_INT8_FILE = os.environ.get("ONNX_INT8_FILE", "onnx/model_qint8_avx512.onnx")
+INFERENCE_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# ✨ OPTIMIZATION: One lock per model so loading BLIP never blocks /transcribe or /ask
+MODEL_KEYS = ("embedding", "reranker", "whisper", "blip", "llm", "ex_llm", "vision_llm")
+_model_locks = {key: threading.Lock() for key in MODEL_KEYS}
+_model_status = {key: {"state": "not_loaded", "load_time": None, "warm": False, "error": None} for key in MODEL_KEYS}
+
+# Set WARMUP_MODELS=0 to skip the background warm-up at startup
+WARMUP_MODELS = os.environ.get("WARMUP_MODELS", "1") != "0"
+WARMUP_RETRIES = int(os.environ.get("WARMUP_RETRIES", 10))
+WARMUP_MAX_BACKOFF = 60
+
+# /ask needs these; BLIP and Whisper only serve uploads and /transcribe
+READINESS_MODELS = ("embedding", "reranker", "llm", "ex_llm")
+# Building a ChatOllama client never contacts the server, so a successful getter proves nothing
+OLLAMA_MODEL_KEYS = ("llm", "ex_llm", "vision_llm")
+
+
+def mark_warm(key):
+    _model_status[key].update(warm=True, error=None)
+
+
+def _timed_load(key, loader):
+    """Run a model loader while recording its state and load time for /ready."""
+    status = _model_status[key]
+    status["state"] = "loading"
+    start = time.perf_counter()
+    try:
+        model = loader()
+    except Exception as e:
+        status.update(state="error", error=str(e))
+        raise
+    status.update(state="loaded", load_time=round(time.perf_counter() - start, 3), error=None)
+    if key not in OLLAMA_MODEL_KEYS:
+        # A lazy load after a failed warm-up still makes the model usable
+        mark_warm(key)
+    return model
+
+
+def _backend_kwargs(backend):
+    """Constructor kwargs selecting the inference backend for SentenceTransformer/CrossEncoder."""
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    if INFERENCE_THREADS:
+        import torch
+        torch.set_num_threads(INFERENCE_THREADS)
+    if not backend.startswith("onnx"):
+        return {}
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if backend == "onnx-int8":
+        model_kwargs["file_name"] = ONNX_INT8_FILE
+    if INFERENCE_THREADS:
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = INFERENCE_THREADS
+        model_kwargs["session_options"] = session_options
+    return {"backend": "onnx", "model_kwargs": model_kwargs}
+
+
+def _quantize_torch_int8(module):
+    import torch
+    torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", **_backend_kwargs(EMBEDDING_BACKEND))
+    if EMBEDDING_BACKEND == "torch-int8":
+        _quantize_torch_int8(model)
+    return model
+
+def _load_reranker():
+    from sentence_transformers import CrossEncoder
+    reranker = CrossEncoder(RERANKER_MODEL_NAME, device="cpu", **_backend_kwargs(RERANKER_BACKEND))
+    if RERANKER_BACKEND == "torch-int8":
+        _quantize_torch_int8(reranker.model)
+    return reranker
+
+
+def embedding_fingerprint():
+    """Identifies the embedding model and backend; vectors with different fingerprints never mix."""
+    parts = [EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND]
+    if EMBEDDING_BACKEND == "onnx-int8":
+        parts.append(ONNX_INT8_FILE)
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def embed_texts(texts):
+    """Encode texts with the configured embedding backend into a float32 array."""
+    # SentenceTransformer.encode already sorts inputs by length inside each call
+    embeddings = get_embedding_model().encode(
+        texts, batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def rerank_scores(question, texts):
+    """Score (question, text) pairs with the reranker, batching similar lengths together."""
+    # Sorting by length keeps padding within each batch small; scores are returned in input order
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_scores = get_reranker().predict(
+        [[question, texts[i]] for i in order], batch_size=RERANKER_BATCH_SIZE, show_progress_bar=False
+    )
+    scores = np.empty(len(texts), dtype=np.float32)
+    scores[order] = sorted_scores
+    return scores
+
+def _load_whisper_model():
+    from faster_whisper import WhisperModel
+    return WhisperModel(WHISPER_MODEL_NAME, device="cpu", compute_type="int8", cpu_threads=INFERENCE_THREADS)
+
+def _load_chat_ollama(model_name):
+    from langchain_ollama.chat_models import ChatOllama
+    return ChatOllama(model=model_name)
+
+
 def get_blip_model():
     global _blip_processor, _blip_model
     if _blip_model is None:
-        with _model_lock:
+        with _model_locks["blip"]:
             if _blip_model is None:
-                from transformers import BlipProcessor, BlipForConditionalGeneration
-                _blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-large")
-                _blip_model = BlipForConditionalGeneration.from_pretrained(
-                    "Salesforce/blip-image-captioning-large"
-                ).to("cpu")
+                def load():
+                    from transformers import BlipProcessor, BlipForConditionalGeneration
+                    processor = BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+                    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME).to("cpu")
+                    return processor, model
+                _blip_processor, _blip_model = _timed_load("blip", load)
     return _blip_processor, _blip_model
 
 
 def get_embedding_model():
     global _embedding_model
     if _embedding_model is None:
-        with _model_lock:
+        with _model_locks["embedding"]:
             if _embedding_model is None:
-                _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                _embedding_model = _timed_load("embedding", _load_embedding_model)
     return _embedding_model
 
 def get_reranker():
     global _reranker
     if _reranker is None:
-        with _model_lock:
+        with _model_locks["reranker"]:
             if _reranker is None:
-                _reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+                _reranker = _timed_load("reranker", _load_reranker)
     return _reranker
 
 def get_whisper_model():
     global _whisper_model
     if _whisper_model is None:
-        with _model_lock:
+        with _model_locks["whisper"]:
             if _whisper_model is None:
-                _whisper_model = WhisperModel("base.en", device="cpu", compute_type="int8")
+                _whisper_model = _timed_load("whisper", _load_whisper_model)
     return _whisper_model
 
 def get_llm():
     global _llm
     if _llm is None:
-        with _model_lock:
+        with _model_locks["llm"]:
             if _llm is None:
-                _llm = ChatOllama(model="llama3.2")
+                _llm = _timed_load("llm", lambda: _load_chat_ollama(LLM_MODEL_NAME))
     return _llm
 
 def get_ex_llm():
     global _ex_llm
     if _ex_llm is None:
-        with _model_lock:
+        with _model_locks["ex_llm"]:
             if _ex_llm is None:
-                _ex_llm = ChatOllama(model="gemma3:1b")
+                _ex_llm = _timed_load("ex_llm", lambda: _load_chat_ollama(EX_LLM_MODEL_NAME))
     return _ex_llm
 
 def get_vision_llm():
     global _vision_llm
     if _vision_llm is None:
-        with _model_lock:
+        with _model_locks["vision_llm"]:
             if _vision_llm is None:
-                _vision_llm = ChatOllama(model="gemma3:4b")
+                _vision_llm = _timed_load("vision_llm", lambda: _load_chat_ollama(VISION_LLM_MODEL_NAME))
     return _vision_llm
 
+
+# --- Model Warm-up ---
+
+def _preload_ollama(model_name):
+    # An empty prompt makes Ollama load the weights into memory without generating
+    import ollama
+    ollama.generate(model=model_name, prompt="")
+
+
+def _warm_embedding():
+    embed_texts(["warm-up"])
+
+def _warm_reranker():
+    rerank_scores("warm-up", ["warm-up"])
+
+def _warm_whisper():
+    segments, _ = get_whisper_model().transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+    list(segments)
+
+def _warm_blip():
+    processor, model = get_blip_model()
+    inputs = processor(Image.new("RGB", (64, 64)), return_tensors="pt")
+    model.generate(**inputs, max_length=5)
+
+def _warm_llm():
+    get_llm()
+    _preload_ollama(LLM_MODEL_NAME)
+
+def _warm_ex_llm():
+    get_ex_llm()
+    _preload_ollama(EX_LLM_MODEL_NAME)
+
+
+# The vision LLM is not on any request path yet, so it is left out of warm-up
+WARMUP_TASKS = {
+    "embedding": _warm_embedding,
+    "reranker": _warm_reranker,
+    "whisper": _warm_whisper,
+    "blip": _warm_blip,
+    "llm": _warm_llm,
+    "ex_llm": _warm_ex_llm,
+}
+
+
+def _run_warmup_task(key):
+    """Run one warm-up task, retrying with exponential backoff (e.g. while Ollama is still starting)."""
+    for attempt in range(WARMUP_RETRIES + 1):
+        try:
+            WARMUP_TASKS[key]()
+            mark_warm(key)
+            return
+        except Exception as e:
+            _model_status[key]["error"] = str(e)
+            if attempt == WARMUP_RETRIES:
+                print(f"Warm-up failed for {key}, giving up: {e}")
+                return
+            backoff = min(2 ** attempt, WARMUP_MAX_BACKOFF)
+            print(f"Warm-up failed for {key}: {e}; retrying in {backoff}s")
+            time.sleep(backoff)
+
+
+def warm_up_models():
+    """Load every model in parallel and run one dummy inference through each."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(WARMUP_TASKS)) as warmup_executor:
+        list(warmup_executor.map(_run_warmup_task, WARMUP_TASKS))
+    print(f"Model warm-up finished in {time.perf_counter() - start:.2f}s")
+
+
+def load_fork_safe_models():
+    """Load the plain torch fp32 models in parallel without running any inference.
+
+    Used by the gunicorn master before forking, so these weights are shared
+    copy-on-write by every worker instead of being loaded once per process.
+    Whisper (CTranslate2), ONNX Runtime sessions and torch-int8 quantization
+    start thread pools or run tensor ops while loading; forked children would
+    inherit the model without those threads, so they are loaded per worker.
+    """
+    loaders = [get_blip_model]
+    if EMBEDDING_BACKEND == "torch":
+        loaders.append(get_embedding_model)
+    if RERANKER_BACKEND == "torch":
+        loaders.append(get_reranker)
+    with ThreadPoolExecutor(max_workers=len(loaders)) as load_executor:
+        for future in [load_executor.submit(loader) for loader in loaders]:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Model preload failed: {e}")
+
+
+def configure_worker_threads(threads):
+    """Cap torch, ONNX Runtime and CTranslate2 intra-op threads for this process.
+
+    Called in every gunicorn worker so workers x threads stays close to the core count.
+    """
+    global INFERENCE_THREADS
+    INFERENCE_THREADS = threads
+    import torch
+    torch.set_num_threads(threads)
+
+
+def start_background_warmup():
+    thread = threading.Thread(target=warm_up_models, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
 executor = ThreadPoolExecutor(max_workers=4)
 
+# --- Latency Metrics ---
+# Exported in Prometheus format at /metrics. Under gunicorn set PROMETHEUS_MULTIPROC_DIR
+# (gunicorn.conf.py does) so every worker's samples are aggregated.
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+ASK_STAGE_SECONDS = Histogram(
+    "rag_ask_stage_seconds", "Latency of each /ask stage", ["stage"], buckets=STAGE_BUCKETS
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds", "Latency of each ingestion stage", ["stage"], buckets=STAGE_BUCKETS
+)
+RERANK_CANDIDATES = Histogram(
+    "rag_ask_rerank_candidates", "Candidates scored by the CrossEncoder per /ask request",
+    buckets=(1, 2, 4, 6, 8, 10, 15, 20, 30, 50)
+)
+ASK_CANCELLED = Counter(
+    "rag_ask_cancelled", "/ask streams stopped early because the client disconnected"
+)
+ASK_TOKENS_PER_SECOND = Histogram(
+    "rag_ask_tokens_per_second", "LLM generation throughput per /ask request",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+)
+
+
+@contextmanager
+def timed_stage(histogram, stage, timings=None):
+    """Observe the duration of the block in ``histogram`` and optionally record it in ``timings``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0) + elapsed, 4)
+
+
+# --- Image Asset Store ---
+# ✨ OPTIMIZATION: Extracted images are stored once under the SHA-256 of their original
+# bytes (no decode/re-encode, no name collisions between uploads) and served from
+# /assets/<name> with immutable cache headers. ?w=<width> returns a downscaled
+# thumbnail that is generated on first request and kept on disk.
+
+ASSET_DIR = os.path.join("temp", "assets")
+THUMBNAIL_DIR = os.path.join(ASSET_DIR, "thumbs")
+THUMBNAIL_WIDTHS = (160, 320, 640, 1024)
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_NAME_PATTERN = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]{1,5})$")
+
+
+def asset_path(asset_name):
+    # Two-level fan-out keeps directories small
+    return os.path.join(ASSET_DIR, asset_name[:2], asset_name)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_image_asset(image_bytes, ext):
+    """Store original image bytes under their content hash; returns the asset name."""
+    ext = re.sub(r"[^a-z0-9]", "", ext.lower())[:5] or "bin"
+    asset_name = f"{hashlib.sha256(image_bytes).hexdigest()}.{ext}"
+    path = asset_path(asset_name)
+    if not os.path.exists(path):
+        _write_atomic(path, image_bytes)
+    return asset_name
+
+
+def asset_thumbnail(asset_name, width):
+    """Path of the thumbnail of ``asset_name`` at ``width`` px, generating it on first use."""
+    digest = ASSET_NAME_PATTERN.match(asset_name).group(1)
+    for ext in ("jpg", "png"):
+        path = os.path.join(THUMBNAIL_DIR, digest[:2], f"{digest}_w{width}.{ext}")
+        if os.path.exists(path):
+            return path
+
+    with Image.open(asset_path(asset_name)) as image:
+        image.thumbnail((width, width * 4))
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.save(buffer, format="PNG", optimize=True)
+        else:
+            image.save(buffer, format="JPEG", quality=85, optimize=True)
+    path = os.path.join(THUMBNAIL_DIR, digest[:2], f"{digest}_w{width}.{'png' if has_alpha else 'jpg'}")
+    _write_atomic(path, buffer.getvalue())
+    return path
+
+
+def image_urls(image_path):
+    """URLs for a document's image: content-addressed assets, or legacy files in temp/."""
+    if ASSET_NAME_PATTERN.match(image_path):
+        return {
+            "image_url": f"/assets/{image_path}",
+            "thumbnail_url": f"/assets/{image_path}?w=320"
+        }
+    return {"image_url": f"/temp/{image_path}", "thumbnail_url": f"/temp/{image_path}"}
+
+
 # --- Processing Functions ---
 
 def describe_image_with_vision_model(image_path, context_before="", context_after=""):
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
     try:
         processor, model = get_blip_model()
-        image = Image.open(image_path).convert("RGB")
-        inputs = processor(image, return_tensors="pt")
-
-        outputs = model.generate(
-            **inputs,
-            max_length=100,
-            num_return_sequences=5,
-            do_sample=True,
-            top_k=50,
-            top_p=0.95
-        )
+        with timed_stage(INGEST_STAGE_SECONDS, "blip"):
+            image = Image.open(image_path).convert("RGB")
+            inputs = processor(image, return_tensors="pt")
+
+            outputs = model.generate(
+                **inputs,
+                max_length=100,
+                num_return_sequences=5,
+                do_sample=True,
+                top_k=50,
+                top_p=0.95
+            )
         caption = "Here are some descriptions of the image: "
         for out in outputs:
             caption += processor.decode(out, skip_special_tokens=True) + " "
@@ -148,7 +525,8 @@ def describe_image_with_vision_model(image_path, context_before="", context_afte
         what can be the type of image [graph, chart, diagram, potrait or photograph] 
         If potrait/photograph who can be in the image what could be the name.""")
         caption_chain = caption_prompt | image_caption_llm | StrOutputParser()
-        caption = caption_chain.invoke({})
+        with timed_stage(INGEST_STAGE_SECONDS, "caption_llm"):
+            caption = caption_chain.invoke({})
         caption = f"Image Description: [{caption.strip()}]"
         print(caption)
         return caption
@@ -160,24 +538,25 @@ def describe_image_with_vision_model(image_path, context_before="", context_afte
 
 def process_standalone_image(file_storage):
     """Processes standalone uploaded images using BLIP for descriptions."""
+    import pytesseract
     try:
-        os.makedirs("temp", exist_ok=True)
-        
-        # Save image to temp folder
         img_filename = secure_filename(file_storage.filename)
-        img_path = os.path.join("temp", img_filename)
-        file_storage.save(img_path)
+        img_bytes = file_storage.read()
         
         # Open and validate image
-        pil_image = Image.open(img_path).convert("RGB")
+        pil_image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        
+        # Store the original bytes in the asset store
+        asset_name = store_image_asset(img_bytes, os.path.splitext(img_filename)[1])
         
         # Get vision description using BLIP
-        vision_description = describe_image_with_vision_model(img_path)
+        vision_description = describe_image_with_vision_model(asset_path(asset_name))
         
         # OCR for any text in the image
         ocr_text = ""
         if pil_image.width > 50 and pil_image.height > 50:
-            ocr_text = pytesseract.image_to_string(pil_image)
+            with timed_stage(INGEST_STAGE_SECONDS, "ocr"):
+                ocr_text = pytesseract.image_to_string(pil_image)
         
         # Create rich document for the standalone image
         image_doc_text = f"""Standalone Image: {img_filename}
@@ -186,7 +565,7 @@ OCR Text: {ocr_text.strip()}""".strip()
         
         return [{
             "text": image_doc_text,
-            "image_path": img_filename,
+            "image_path": asset_name,
             "source_filename": img_filename,
             "type": "standalone_image",
             "page_num": 1
@@ -199,18 +578,28 @@ OCR Text: {ocr_text.strip()}""".strip()
 
 def process_pdf(file_storage):
     """Processes a PDF file by extracting text chunks and images with OCR + Vision descriptions."""
+    import fitz
+    import pytesseract
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     file_bytes = io.BytesIO(file_storage.read())
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
+    with timed_stage(INGEST_STAGE_SECONDS, "parse"):
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
     
     processed_data = []
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
 
     def process_page(page_num):
+        with timed_stage(INGEST_STAGE_SECONDS, "page"):
+            return _process_page(page_num)
+
+    def _process_page(page_num):
         page = doc[page_num]
         page_data = []
         
         # Process text
-        text = page.get_text()
+        with timed_stage(INGEST_STAGE_SECONDS, "parse"):
+            text = page.get_text()
         if text.strip():
             chunks = text_splitter.split_text(text)
             for chunk in chunks:
@@ -229,14 +618,11 @@ def process_pdf(file_storage):
                 img_bytes = base_image["image"]
                 pil_image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
 
-                os.makedirs("temp", exist_ok=True)
-                ext = base_image["ext"]
-                img_filename = f"{os.path.splitext(file_storage.filename)[0]}_p{page_num+1}_{img_index}.{ext}"
-                img_path = os.path.join("temp", img_filename)
-                pil_image.save(img_path)
+                asset_name = store_image_asset(img_bytes, base_image["ext"])
 
-                ocr_text = pytesseract.image_to_string(pil_image)
-                vision_description = describe_image_with_vision_model(img_path)
+                with timed_stage(INGEST_STAGE_SECONDS, "ocr"):
+                    ocr_text = pytesseract.image_to_string(pil_image)
+                vision_description = describe_image_with_vision_model(asset_path(asset_name))
                 
                 image_doc_text = f"""Image from page {page_num + 1} of {file_storage.filename}
 Vision Description: {vision_description}
@@ -244,7 +630,7 @@ OCR Text: {ocr_text.strip()}""".strip()
 
                 page_data.append({
                     "text": image_doc_text,
-                    "image_path": img_filename,
+                    "image_path": asset_name,
                     "page_num": page_num + 1,
                     "source_filename": file_storage.filename,
                     "type": "image",
@@ -267,8 +653,13 @@ OCR Text: {ocr_text.strip()}""".strip()
 
 def process_docx(file_storage):
     """Processes a DOCX file by extracting content in proper sequence (text and images)."""
+    import docx
+    import pytesseract
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
     file_bytes = io.BytesIO(file_storage.read())
-    doc = docx.Document(file_bytes)
+    with timed_stage(INGEST_STAGE_SECONDS, "parse"):
+        doc = docx.Document(file_bytes)
     
     doc_data = []
     os.makedirs("temp", exist_ok=True)
@@ -380,18 +771,16 @@ def process_docx(file_storage):
                 img_data = rel.target_part.blob
                 img = Image.open(io.BytesIO(img_data)).convert("RGB")
                 
-                ext = rel.target_ref.split('.')[-1]
-                img_filename = f"{os.path.splitext(file_storage.filename)[0]}_img{position}.{ext}"
-                img_path = os.path.join("temp", img_filename)
-                img.save(img_path)
+                asset_name = store_image_asset(img_data, rel.target_ref.split('.')[-1])
                 
                 # OCR
                 ocr_text = ""
                 if img.width > 50 and img.height > 50:
-                    ocr_text = pytesseract.image_to_string(img)
+                    with timed_stage(INGEST_STAGE_SECONDS, "ocr"):
+                        ocr_text = pytesseract.image_to_string(img)
                 
                 # Vision description with surrounding context
-                vision_description = describe_image_with_vision_model(img_path)
+                vision_description = describe_image_with_vision_model(asset_path(asset_name))
                 
                 image_doc_text = f"""Image from {file_storage.filename}
 Vision Description: {vision_description}
@@ -400,7 +789,7 @@ OCR Text: {ocr_text.strip()}""".strip()
                 position += 1
                 doc_data.append({
                     "text": image_doc_text,
-                    "image_path": img_filename,
+                    "image_path": asset_name,
                     "page_num": position,
                     "source_filename": file_storage.filename,
                     "type": "image",
@@ -431,16 +820,17 @@ def process_audio(file_storage):
 
     # Transcribe with whisper
     whisper = get_whisper_model()
-    segments, _ = whisper.transcribe(audio_path, beam_size=5)
-
-    # Normalize segments into simple dicts with float times
-    timed_segments = []
-    for seg in segments:
-        timed_segments.append({
-            "text": seg.text.strip(),
-            "start": float(seg.start),
-            "end": float(seg.end)
-        })
+    with timed_stage(INGEST_STAGE_SECONDS, "transcribe"):
+        segments, _ = whisper.transcribe(audio_path, beam_size=5)
+
+        # Normalize segments into simple dicts with float times (segments decode lazily)
+        timed_segments = []
+        for seg in segments:
+            timed_segments.append({
+                "text": seg.text.strip(),
+                "start": float(seg.start),
+                "end": float(seg.end)
+            })
 
     if not timed_segments:
         return []
@@ -524,14 +914,272 @@ def process_audio(file_storage):
 
     return chunk_data
 
+class VectorShards:
+    """Row-addressable view over per-file embedding arrays, usually memory-mapped cache files."""
+
+    def __init__(self, shards=()):
+        self._shards = []
+        self._starts = []
+        self.ntotal = 0
+        for shard in shards:
+            self.append(shard)
+
+    def append(self, vectors):
+        self._starts.append(self.ntotal)
+        self._shards.append(vectors)
+        self.ntotal += len(vectors)
+
+    def take(self, ids):
+        """Gather rows by global id as float32."""
+        rows = []
+        for i in ids:
+            shard = bisect.bisect_right(self._starts, i) - 1
+            rows.append(self._shards[shard][i - self._starts[shard]])
+        return np.asarray(rows, dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        return sum(shard.nbytes for shard in self._shards)
+
+
+# Letters and digits in any script, so names like "Müller" or "東京" are indexed whole
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+
+# Too common to tell chunks apart; left out of the postings entirely
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "me my no not of on or our over so such than that the their them then there these they "
+    "this to was we were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercased word tokens; identifiers such as PN-00123 or v2.1 stay whole."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Append-only inverted index with Okapi BM25 scoring; document ids match the FAISS ids.
+
+    Postings are stored column-wise in numpy arrays: a sorted vocabulary, each term's
+    slice of the doc id / term frequency arrays, and the document lengths. In shared
+    mode they are saved as .npy files that workers map read-only, and each published
+    generation extends the previous one's arrays instead of re-tokenizing the corpus.
+    """
+
+    FILES = ("terms", "offsets", "doc_ids", "tfs", "doc_lengths")
+    MAX_TERM_LENGTH = 64  # longer tokens are OCR noise or encoded blobs and would widen every vocabulary entry
+
+    def __init__(self, k1=1.5, b=0.75, max_df=BM25_MAX_DF):
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        # Swapped as one tuple so concurrent searches never see half-merged arrays
+        self._arrays = (
+            np.empty(0, dtype="S1"),
+            np.zeros(1, dtype=np.int64),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+        )
+
+    @property
+    def doc_count(self):
+        return len(self._arrays[4])
+
+    def add(self, texts):
+        terms, offsets, doc_ids, tfs, doc_lengths = self._arrays
+        new_terms, new_doc_ids, new_tfs, new_lengths = [], [], [], []
+        for doc_id, text in enumerate(texts, start=len(doc_lengths)):
+            tokens = tokenize(text)
+            frequencies = defaultdict(int)
+            for token in tokens:
+                if token not in STOPWORDS and len(token) <= self.MAX_TERM_LENGTH:
+                    frequencies[token] += 1
+            for term, frequency in frequencies.items():
+                new_terms.append(term.encode("utf-8"))
+                new_doc_ids.append(doc_id)
+                new_tfs.append(frequency)
+            new_lengths.append(len(tokens))
+        if not new_lengths:
+            return
+
+        # Merge as (term, doc, tf) triples; a stable sort keeps each term's doc ids ascending
+        new_terms = np.asarray(new_terms, dtype=bytes)
+        merged_terms = np.union1d(terms, new_terms)
+        term_ids = np.concatenate([
+            np.repeat(np.searchsorted(merged_terms, terms), np.diff(offsets)),
+            np.searchsorted(merged_terms, new_terms),
+        ])
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=len(merged_terms))
+        self._arrays = (
+            merged_terms,
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            np.concatenate([doc_ids, np.asarray(new_doc_ids, dtype=np.int32)])[order],
+            np.concatenate([tfs, np.asarray(new_tfs, dtype=np.int32)])[order],
+            np.concatenate([doc_lengths, np.asarray(new_lengths, dtype=np.int32)]),
+        )
+
+    def extended(self, texts):
+        """Return a copy with ``texts`` appended, leaving this index untouched."""
+        index = copy.copy(self)
+        index.add(texts)
+        return index
+
+    def _term_slice(self, term, terms, offsets):
+        key = term.encode("utf-8")
+        position = int(np.searchsorted(terms, key))
+        if position < len(terms) and terms[position] == key:
+            return int(offsets[position]), int(offsets[position + 1])
+        return None
+
+    def _scored_slice(self, term, terms, offsets, n_docs):
+        """The term's postings slice, or None if it is unknown or too frequent to score."""
+        span = self._term_slice(term, terms, offsets)
+        # Terms in more than max_df of the chunks barely change the ranking but have the longest postings
+        if span is None or span[1] - span[0] > max(self.max_df * n_docs, 1):
+            return None
+        return span
+
+    def __contains__(self, term):
+        terms, offsets = self._arrays[:2]
+        return self._term_slice(term, terms, offsets) is not None
+
+    def searchable(self, term):
+        """Whether search() scores ``term``: it is indexed and under the document-frequency cutoff."""
+        terms, offsets, _, _, doc_lengths = self._arrays
+        return self._scored_slice(term, terms, offsets, len(doc_lengths)) is not None
+
+    def search(self, query, k):
+        """Return up to k document ids, best BM25 score first."""
+        terms, offsets, doc_ids, tfs, doc_lengths = self._arrays
+        n_docs = len(doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = doc_lengths.sum() / n_docs or 1
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            span = self._scored_slice(term, terms, offsets, n_docs)
+            if span is None:
+                continue
+            start, end = span
+            df = end - start
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            docs = doc_ids[start:end]
+            frequency = tfs[start:end].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / avg_length)
+            scores[docs] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return matched[np.argsort(-scores[matched], kind="stable")].tolist()
+
+    def save(self, path):
+        for name, array in zip(self.FILES, self._arrays):
+            np.save(os.path.join(path, f"bm25_{name}.npy"), array)
+
+    @classmethod
+    def load(cls, path):
+        """Map the postings saved by save() read-only."""
+        index = cls()
+        index._arrays = tuple(np.load(os.path.join(path, f"bm25_{name}.npy"), mmap_mode="r") for name in cls.FILES)
+        return index
+
+
+def exact_match_terms(question):
+    """Quoted phrases and identifier-like tokens (mixing letters and digits) that lexical search scores.
+
+    Such queries are answered best by lexical matching, so query expansion is skipped for them.
+    Bare numbers ("page 5") and terms too frequent for search() to score are left to expansion.
+    """
+    if lexical_index is None:
+        return []
+    terms = [t for phrase in re.findall(r'"([^"]+)"', question) for t in tokenize(phrase)]
+    terms += [t for t in tokenize(question) if any(c.isdigit() for c in t) and any(c.isalpha() for c in t)]
+    return [t for t in terms if lexical_index.searchable(t)]
+
+
+def reciprocal_rank_fusion(ranked_lists, limit):
+    """Merge ranked id lists by reciprocal rank fusion and keep the best ``limit`` ids."""
+    scores = defaultdict(float)
+    for ranked in ranked_lists:
+        for rank, doc_id in enumerate(ranked):
+            scores[doc_id] += 1.0 / (RRF_K + rank + 1)
+    return heapq.nlargest(limit, scores, key=scores.get)
+
+
+def new_vector_index(training_vectors, storage=None):
+    """Create an empty index for the storage mode, trained on ``training_vectors`` if it needs it."""
+    import faiss
+    storage = storage or VECTOR_STORAGE
+    if storage not in VECTOR_STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage {storage!r}, expected one of {VECTOR_STORAGE_MODES}")
+    dimension = training_vectors.shape[1]
+    if storage == "pq" and len(training_vectors) < PQ_MIN_TRAINING_VECTORS:
+        # Too few vectors to train 256-entry codebooks; the index is not retrained later
+        print(f"Only {len(training_vectors)} vectors to train PQ, using int8 scalar quantization instead")
+        storage = "int8"
+
+    if storage == "float32":
+        return faiss.IndexFlatL2(dimension)
+    if storage == "pq":
+        index = faiss.IndexPQ(dimension, PQ_SUBQUANTIZERS, 8, faiss.METRIC_L2)
+    else:
+        qtype = faiss.ScalarQuantizer.QT_fp16 if storage == "float16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+    return index
+
+
+def rescore(query_embeddings, shortlist, vectors, k):
+    """Re-rank each query's shortlist by exact L2 distance against ``vectors`` (a VectorShards)."""
+    distances = np.full((len(query_embeddings), k), np.inf, dtype=np.float32)
+    ids = np.full((len(query_embeddings), k), -1, dtype=np.int64)
+    for row, (query, candidates) in enumerate(zip(query_embeddings, shortlist)):
+        candidates = candidates[candidates >= 0]
+        if not len(candidates):
+            continue
+        exact = ((vectors.take(candidates) - query) ** 2).sum(axis=1)
+        order = np.argsort(exact)[:k]
+        distances[row, :len(order)] = exact[order]
+        ids[row, :len(order)] = candidates[order]
+    return distances, ids
+
+
+def search_vectors(query_embeddings, k):
+    """Search the live index; compressed indexes over-fetch and re-score the shortlist exactly."""
+    if VECTOR_STORAGE == "float32" or stored_vectors is None or stored_vectors.ntotal != vector_store.ntotal:
+        return vector_store.search(query_embeddings, k)
+    shortlist_k = min(k * RESCORE_FACTOR, vector_store.ntotal)
+    _, shortlist = vector_store.search(query_embeddings, shortlist_k)
+    return rescore(query_embeddings, shortlist, stored_vectors, k)
+
+
+def vector_storage_report():
+    """Memory used by the live index and by the re-scoring vectors."""
+    index_bytes = 0
+    if vector_store is not None and vector_store.ntotal:
+        index_bytes = vector_store.sa_code_size() * vector_store.ntotal
+    return {
+        "configured_mode": VECTOR_STORAGE,
+        # PQ falls back to int8 when the first upload was too small to train it
+        "index_type": type(vector_store).__name__ if vector_store is not None else None,
+        "vectors": vector_store.ntotal if vector_store else 0,
+        "index_bytes": index_bytes,
+        "index_bytes_per_vector": index_bytes / vector_store.ntotal if index_bytes else 0,
+        "stored_vector_bytes": stored_vectors.nbytes if stored_vectors else 0,
+        "stored_vector_dtype": np.dtype(CACHE_VECTOR_DTYPE).name
+    }
+
+
 def create_vector_store_from_docs(documents):
-    embedding_model = get_embedding_model()
     texts = [doc['text'] for doc in documents]
-    embeddings = embedding_model.encode(texts, convert_to_tensor=True, show_progress_bar=False)
+    embeddings = embed_texts(texts)
     
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings.cpu().numpy())
+    index = new_vector_index(embeddings)
+    index.add(embeddings)
     return index
     
 
@@ -542,7 +1190,57 @@ def format_timestamp(seconds):
     return f"{minutes:02d}:{secs:02d}"
 
 
+def build_sources(retrieved_results, question):
+    """Source objects for the reranked documents, as sent in the "sources" frame."""
+    # ✨ Check if we should display images
+    should_show_images = any(keyword in question.lower() for keyword in ['show', 'display', 'image', 'graph', 'chart', 'diagram', 'picture'])
+    
+    sources = []
+    for doc, score in retrieved_results:
+        source_obj = {
+            "source_filename": doc['source_filename'],
+            "page_num": doc.get('page_num', 0),
+            "source_content": doc['text'],
+            "type": doc.get('type', 'unknown'),
+            "score": float(score)
+        }
+        if doc.get('type') in ['image', 'standalone_image']: 
+            source_obj['image_path'] = doc['image_path']
+            source_obj.update(image_urls(doc['image_path']))
+            source_obj['vision_description'] = doc.get('vision_description', '')
+            source_obj['show_inline'] = should_show_images
+        
+        if doc.get('type') == 'audio':
+            source_obj['start_time'] = doc.get('start_time')
+            source_obj['end_time'] = doc.get('end_time')
+            source_obj['duration'] = doc.get('duration')
+            source_obj['timestamp_display'] = f"{format_timestamp(doc.get('start_time'))} - {format_timestamp(doc.get('end_time'))}"
+        
+        sources.append(source_obj)
+    return sources
+
+
+# ✨ /ask streams newline-delimited JSON frames, in order:
+#   {"type": "sources", "content": [...]}          retrieval results, before any token
+#   {"type": "token", "content": "..."}            one per LLM chunk
+#   {"type": "done", "timings": {...}}             per-stage timing breakdown
+# or {"type": "error", "content": "..."} if generation fails part-way.
+
+def ndjson_frame(payload):
+    return json.dumps(payload) + "\n"
+
+
+def ndjson_response(frames):
+    response = Response(stream_with_context(frames), mimetype='application/x-ndjson')
+    # Stop reverse proxies from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def expand_query(query):
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
     print("Expanding query for better retrieval...")
     template = """Based on the user's question, generate 3 additional, different, and more specific queries that are likely to find relevant documents in a vector database.
 Focus on rephrasing, using synonyms, and breaking down the question into sub-questions.
@@ -558,6 +1256,7 @@ Generated Queries:"""
     
     try:
         response = chain.invoke({"question": query})
+        mark_warm("ex_llm")
         expanded_queries = [q.strip() for q in response.strip().split('\n') if q.strip()]
         all_queries = [query] + expanded_queries[:3]
         print("Expanded Queries:", all_queries)
@@ -567,20 +1266,29 @@ Generated Queries:"""
         return [query]
 
 
+def cached_embeddings_path(file_hash):
+    # Keyed by backend and storage dtype: switching either re-embeds instead of mixing
+    # vectors or feeding fp16-rounded vectors to the exact float32 index
+    dtype = np.dtype(CACHE_VECTOR_DTYPE).name
+    return os.path.join(CACHE_DIR, file_hash, f"embeddings-{embedding_fingerprint()}-{dtype}.npy")
+
+
 def load_from_cache(file_hash):
     """Load processed document data and embeddings from cache."""
     cache_path = os.path.join(CACHE_DIR, file_hash)
     docs_path = os.path.join(cache_path, "documents.pkl")
-    embeddings_path = os.path.join(cache_path, "embeddings.npy")
+    embeddings_path = cached_embeddings_path(file_hash)
     
     if os.path.exists(docs_path):
         try:
-            with open(docs_path, "rb") as f:
-                docs = pickle.load(f)
-            
-            embeddings = None
-            if os.path.exists(embeddings_path):
-                embeddings = np.load(embeddings_path)
+            with timed_stage(INGEST_STAGE_SECONDS, "cache_load"):
+                with open(docs_path, "rb") as f:
+                    docs = pickle.load(f)
+                
+                embeddings = None
+                if os.path.exists(embeddings_path):
+                    # Memory-mapped: these pages back exact re-scoring without being held in RAM
+                    embeddings = np.load(embeddings_path, mmap_mode="r")
                 
             return {
                 "docs": docs,
@@ -592,19 +1300,245 @@ def load_from_cache(file_hash):
 
 
 def save_to_cache(file_hash, docs, embeddings=None):
-    """Save processed document data and embeddings to cache."""
+    """Save processed document data and embeddings to cache.
+
+    Returns the saved embeddings memory-mapped at cache precision, or None.
+    """
     cache_path = os.path.join(CACHE_DIR, file_hash)
     os.makedirs(cache_path, exist_ok=True)
     
-    with open(os.path.join(cache_path, "documents.pkl"), "wb") as f:
-        pickle.dump(docs, f)
-    
-    if embeddings is not None:
-        np.save(os.path.join(cache_path, "embeddings.npy"), embeddings)
+    with timed_stage(INGEST_STAGE_SECONDS, "cache_save"):
+        with open(os.path.join(cache_path, "documents.pkl"), "wb") as f:
+            pickle.dump(docs, f)
+        
+        if embeddings is not None:
+            embeddings_path = cached_embeddings_path(file_hash)
+            np.save(embeddings_path, np.asarray(embeddings, dtype=CACHE_VECTOR_DTYPE))
+            return np.load(embeddings_path, mmap_mode="r")
+    return None
+
+
+# --- Shared Index (multi-worker serving) ---
+# One writer at a time (serialized by a file lock) publishes an immutable index
+# "generation" directory and then atomically points INDEX_DIR/CURRENT at it.
+# Every worker checks CURRENT before handling a request and maps a newer
+# generation read-only, so the page cache holds one copy for all workers.
+
+#
+# Each upload adds one "segment" (metadata lines, their offsets and the vectors
+# at cache precision); a new generation hard-links the previous generation's
+# segment files, so publishing costs time proportional to the upload, not the corpus.
+
+_index_generation = None
+_index_segments = []  # segment ids of the mapped generation, in document order
+_index_sync_lock = threading.Lock()
+_index_write_lock = threading.Lock()  # index_writer() in single-process mode
+GENERATIONS_TO_KEEP = 2
+SEGMENT_FILES = ("metadata.jsonl", "offsets.npy", "vectors.npy")
+
+
+def _segment_file(generation_path, segment, name):
+    """Path of one segment's file; generations from before segments have a single unnamed one."""
+    stem, ext = os.path.splitext(name)
+    return os.path.join(generation_path, f"{stem}-{segment}{ext}" if segment else name)
+
+
+class MappedMetadata:
+    """Read-only, list-like view of document metadata stored as JSON lines in mmaps, one per segment."""
+
+    def __init__(self, generation_path, segments=("",)):
+        import mmap
+        self._segments = []
+        self._starts = []
+        self._length = 0
+        for segment in segments:
+            offsets = np.load(_segment_file(generation_path, segment, "offsets.npy"), mmap_mode="r")
+            with open(_segment_file(generation_path, segment, "metadata.jsonl"), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            self._starts.append(self._length)
+            self._segments.append((offsets, data))
+            self._length += max(len(offsets) - 1, 0)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        segment = bisect.bisect_right(self._starts, i) - 1
+        offsets, data = self._segments[segment]
+        i -= self._starts[segment]
+        return json.loads(data[int(offsets[i]):int(offsets[i + 1])])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _read_current_generation():
+    try:
+        with open(os.path.join(INDEX_DIR, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def sync_shared_index():
+    """Map the latest published generation if it is newer than the one this process holds."""
+    global all_documents_metadata, vector_store, stored_vectors, lexical_index, session_uploaded_files, session_file_hashes, session_file_indices, _index_generation, _index_segments
+    if not SHARED_INDEX:
+        return
+    generation = _read_current_generation()
+    if generation == _index_generation:
+        return
+    with _index_sync_lock:
+        if generation == _index_generation:
+            return
+        session = None
+        if generation is not None:
+            generation_path = os.path.join(INDEX_DIR, generation)
+            with open(os.path.join(generation_path, "session.json")) as f:
+                session = json.load(f)
+            if session.get("embedding_fingerprint") != embedding_fingerprint():
+                # Vectors from another embedding backend are not comparable; start from an empty index
+                print(f"Ignoring index generation {generation}: built with a different embedding backend")
+                session = None
+        if session is None:
+            all_documents_metadata, vector_store, stored_vectors, lexical_index = [], None, None, None
+            session_uploaded_files, session_file_hashes, session_file_indices = set(), {}, {}
+            _index_segments = []
+        else:
+            import faiss
+            index_path = os.path.join(generation_path, "index.faiss")
+            if os.path.exists(index_path):
+                # IO_FLAG_MMAP_IFC maps flat codes on newer faiss; older builds copy them into memory
+                mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+                vector_store = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+            else:
+                vector_store = None
+            # Generations published before segments hold one unnamed segment
+            _index_segments = session.get("segments", [""])
+            vector_paths = [_segment_file(generation_path, segment, "vectors.npy") for segment in _index_segments]
+            if _index_segments and all(os.path.exists(path) for path in vector_paths):
+                stored_vectors = VectorShards(np.load(path, mmap_mode="r") for path in vector_paths)
+            else:
+                stored_vectors = None
+            all_documents_metadata = MappedMetadata(generation_path, _index_segments)
+            if os.path.exists(os.path.join(generation_path, "bm25_terms.npy")):
+                lexical_index = BM25Index.load(generation_path)
+            else:
+                # Generations published before the postings were saved as arrays
+                lexical_index = BM25Index()
+                lexical_index.add(doc['text'] for doc in all_documents_metadata)
+            session_uploaded_files = set(session["uploaded_files"])
+            session_file_hashes = session["file_hashes"]
+            session_file_indices = session["file_indices"]
+        _index_generation = generation
+        print(f"Mapped index generation {generation} ({len(all_documents_metadata)} chunks)")
+
+
+@contextmanager
+def index_writer():
+    """Serialize ingestion: across worker processes in shared mode, across request threads otherwise."""
+    if not SHARED_INDEX:
+        # Interleaved appends would misalign FAISS ids, stored vector rows, BM25 doc ids and metadata
+        with _index_write_lock:
+            yield
+        return
+    import fcntl
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with open(os.path.join(INDEX_DIR, ".writer.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Pick up whatever the previous writer published before appending to it
+            sync_shared_index()
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def publish_generation(new_documents=(), new_embeddings=None):
+    """Append documents and their vectors to the mapped generation as a new one and make it current.
+
+    Must be called inside index_writer(). The new documents become one more segment
+    and ``new_embeddings`` (one row per document) are added to a writable copy of the
+    current index, so a trained quantizer is kept rather than retrained. The BM25
+    postings are extended the same way. After a cleared session this starts over.
+    """
+    import faiss
+    current = _read_current_generation()
+    number = int(current.split("-")[1]) + 1 if current else 1
+    generation = f"gen-{number:06d}"
+    tmp_path = os.path.join(INDEX_DIR, f".{generation}.tmp")
+    os.makedirs(tmp_path, exist_ok=True)
+
+    # Generations are immutable, so the previous segments are shared as hard links
+    segments = list(_index_segments)
+    current_path = os.path.join(INDEX_DIR, _index_generation) if _index_generation else None
+    for segment in segments:
+        for name in SEGMENT_FILES:
+            source = _segment_file(current_path, segment, name)
+            if os.path.exists(source):
+                os.link(source, _segment_file(tmp_path, segment, name))
+
+    if new_documents:
+        segment = f"{number:06d}"
+        offsets = [0]
+        with open(_segment_file(tmp_path, segment, "metadata.jsonl"), "wb") as f:
+            for doc in new_documents:
+                f.write(json.dumps(doc).encode("utf-8") + b"\n")
+                offsets.append(f.tell())
+        np.save(_segment_file(tmp_path, segment, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        if new_embeddings is not None:
+            np.save(_segment_file(tmp_path, segment, "vectors.npy"), np.asarray(new_embeddings, dtype=CACHE_VECTOR_DTYPE))
+        segments.append(segment)
+
+    has_index = vector_store is not None and vector_store.ntotal > 0
+    if new_embeddings is not None and len(new_embeddings):
+        new_embeddings = np.ascontiguousarray(new_embeddings, dtype=np.float32)
+        # The mapped index is read-only; read the file again without the mmap flag to extend it
+        index = faiss.read_index(os.path.join(current_path, "index.faiss")) if has_index else new_vector_index(new_embeddings)
+        index.add(new_embeddings)
+        faiss.write_index(index, os.path.join(tmp_path, "index.faiss"))
+    elif has_index:
+        os.link(os.path.join(current_path, "index.faiss"), os.path.join(tmp_path, "index.faiss"))
+
+    previous = lexical_index if lexical_index is not None else BM25Index()
+    previous.extended(doc['text'] for doc in new_documents).save(tmp_path)
+
+    with open(os.path.join(tmp_path, "session.json"), "w") as f:
+        json.dump({
+            "embedding_fingerprint": embedding_fingerprint(),
+            "segments": segments,
+            "uploaded_files": sorted(session_uploaded_files),
+            "file_hashes": session_file_hashes,
+            "file_indices": session_file_indices
+        }, f)
+
+    os.rename(tmp_path, os.path.join(INDEX_DIR, generation))
+    pointer_tmp = os.path.join(INDEX_DIR, "CURRENT.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(INDEX_DIR, "CURRENT"))
+
+    # Workers still mapping an older generation keep their (unlinked) files until they remap
+    generations = sorted(d for d in os.listdir(INDEX_DIR) if d.startswith("gen-"))
+    for old in generations[:-GENERATIONS_TO_KEEP]:
+        shutil.rmtree(os.path.join(INDEX_DIR, old), ignore_errors=True)
+
+    sync_shared_index()
 
 
 # --- Flask Routes ---
 
+@app.before_request
+def sync_index_before_request():
+    sync_shared_index()
+
+
 @app.route('/')
 def index():
     """Health check endpoint"""
@@ -617,103 +1551,61 @@ def index():
             'transcribe': '/transcribe',
             'files': '/files',
             'clear_session': '/clear-session',
+            'ready': '/ready',
+            'metrics': '/metrics',
+            'assets': '/assets/<asset>?w=<width>',
             'temp_files': '/temp/<filename>'
         }
     })
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: per-stage latency histograms for /ask and ingestion."""
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+@app.route('/ready')
+def ready():
+    """Readiness endpoint: reports load state and load time of each model."""
+    # Without warm-up the models load lazily on first use, so there is nothing to wait for
+    is_ready = not WARMUP_MODELS or all(_model_status[key]["warm"] for key in READINESS_MODELS)
+    return jsonify({
+        'ready': is_ready,
+        'warmup_enabled': WARMUP_MODELS,
+        'required_models': READINESS_MODELS,
+        'models': _model_status
+    }), 200 if is_ready else 503
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global all_documents_metadata, vector_store, session_uploaded_files, session_file_hashes, session_file_indices
     try:
         if 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
 
-        files = request.files.getlist('files')
-        newly_processed_docs = []
-        processed_filenames = []
-        
-        all_new_embeddings = []
-        all_new_docs = []
-
-        for file in files:
+        # Parsing, OCR, captioning and embedding can take minutes; they only touch the
+        # per-file cache, so they run before the writer lock is taken
+        processed_files = []
+        for file in request.files.getlist('files'):
             file_bytes = file.read()
             file.seek(0)
             file_hash = hashlib.sha256(file_bytes).hexdigest()
             
-            if file.filename in session_uploaded_files and session_file_hashes.get(file.filename) == file_hash:
+            if _already_uploaded(file.filename, file_hash):
                 print(f"File {file.filename} already uploaded, skipping...")
                 continue
             
-            cached_data = load_from_cache(file_hash)
-            
-            if cached_data is not None and cached_data["docs"] is not None:
-                print(f"Loading {file.filename} from cache...")
-                docs = cached_data["docs"]
-                cached_embeddings = cached_data["embeddings"]
-                
-                for doc in docs:
-                    doc['source_filename'] = file.filename
-                
-                if cached_embeddings is not None:
-                    print(f"Using cached embeddings for {file.filename}")
-                    new_embeddings = cached_embeddings
-                else:
-                    print(f"Creating embeddings for cached documents of {file.filename}")
-                    embedding_model = get_embedding_model()
-                    new_texts = [doc['text'] for doc in docs]
-                    new_embeddings = embedding_model.encode(new_texts, convert_to_tensor=True, show_progress_bar=False).cpu().numpy()
-                    save_to_cache(file_hash, docs, new_embeddings)
-                    
-            else:
-                print(f"Processing new file: {file.filename}")
-                
-                filename = file.filename.lower()
-                if filename.endswith('.pdf'):
-                    docs = process_pdf(file)
-                elif filename.endswith('.docx'):
-                    docs = process_docx(file)
-                elif filename.endswith(('.mp3', '.wav', '.m4a', '.ogg')):
-                    docs = process_audio(file)
-                elif filename.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
-                    docs = process_standalone_image(file)
-                else:
-                    continue
-                
-                if not docs: 
-                    continue
-                
-                new_texts = [doc['text'] for doc in docs]
-                embedding_model = get_embedding_model()
-                new_embeddings = embedding_model.encode(new_texts, convert_to_tensor=True, show_progress_bar=False).cpu().numpy()
-                
-                save_to_cache(file_hash, docs, new_embeddings)
-            
-            start_idx = len(all_documents_metadata) + len(all_new_docs)
-            end_idx = start_idx + len(docs)
-            session_file_indices[file.filename] = {
-                "start": start_idx,
-                "end": end_idx,
-                "count": len(docs)
-            }
-            
-            all_new_docs.extend(docs)
-            all_new_embeddings.append(new_embeddings)
-            session_uploaded_files.add(file.filename)
-            session_file_hashes[file.filename] = file_hash
-            processed_filenames.append(file.filename)
-
-        if all_new_embeddings:
-            combined_embeddings = np.vstack(all_new_embeddings)
-            
-            if vector_store is None:
-                dimension = combined_embeddings.shape[1]
-                vector_store = faiss.IndexFlatL2(dimension)
-            
-            vector_store.add(combined_embeddings)
-            all_documents_metadata.extend(all_new_docs)
-            
-            print(f"Added {len(all_new_docs)} total chunks from {len(processed_filenames)} files")
+            docs, new_embeddings = _process_file(file, file_hash)
+            if docs:
+                processed_files.append((file.filename, file_hash, docs, new_embeddings))
+
+        with index_writer():
+            processed_filenames = _add_processed_files(processed_files)
 
         return jsonify({'message': 'Files processed successfully', 'filenames': processed_filenames})
 
@@ -723,41 +1615,162 @@ def upload_file():
         return jsonify({'error': str(e)}), 500
 
 
+def _already_uploaded(filename, file_hash):
+    return filename in session_uploaded_files and session_file_hashes.get(filename) == file_hash
+
+
+def _process_file(file, file_hash):
+    """Return the chunks of one uploaded file and their embeddings, from the cache when possible."""
+    cached_data = load_from_cache(file_hash)
+    
+    if cached_data is not None and cached_data["docs"] is not None:
+        print(f"Loading {file.filename} from cache...")
+        docs = cached_data["docs"]
+        cached_embeddings = cached_data["embeddings"]
+        if not docs:
+            return None, None
+        
+        for doc in docs:
+            doc['source_filename'] = file.filename
+        
+        if cached_embeddings is not None:
+            print(f"Using cached embeddings for {file.filename}")
+            return docs, cached_embeddings
+        
+        print(f"Creating embeddings for cached documents of {file.filename}")
+        new_texts = [doc['text'] for doc in docs]
+        with timed_stage(INGEST_STAGE_SECONDS, "embed"):
+            new_embeddings = embed_texts(new_texts)
+        return docs, save_to_cache(file_hash, docs, new_embeddings)
+    
+    print(f"Processing new file: {file.filename}")
+    
+    filename = file.filename.lower()
+    file_start = time.perf_counter()
+    if filename.endswith('.pdf'):
+        docs = process_pdf(file)
+    elif filename.endswith('.docx'):
+        docs = process_docx(file)
+    elif filename.endswith(('.mp3', '.wav', '.m4a', '.ogg')):
+        docs = process_audio(file)
+    elif filename.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')):
+        docs = process_standalone_image(file)
+    else:
+        return None, None
+    
+    if not docs: 
+        return None, None
+    
+    new_texts = [doc['text'] for doc in docs]
+    with timed_stage(INGEST_STAGE_SECONDS, "embed"):
+        new_embeddings = embed_texts(new_texts)
+    INGEST_STAGE_SECONDS.labels(stage="file").observe(time.perf_counter() - file_start)
+    
+    return docs, save_to_cache(file_hash, docs, new_embeddings)
+
+
+def _add_processed_files(processed_files):
+    """Append processed files to the index; must be called inside index_writer()."""
+    global all_documents_metadata, vector_store, stored_vectors, lexical_index
+    processed_filenames = []
+    all_new_embeddings = []
+    all_new_docs = []
+
+    for filename, file_hash, docs, new_embeddings in processed_files:
+        # Another upload may have added the same file while this one was processing
+        if _already_uploaded(filename, file_hash):
+            print(f"File {filename} already uploaded, skipping...")
+            continue
+        
+        start_idx = len(all_documents_metadata) + len(all_new_docs)
+        end_idx = start_idx + len(docs)
+        session_file_indices[filename] = {
+            "start": start_idx,
+            "end": end_idx,
+            "count": len(docs)
+        }
+        
+        all_new_docs.extend(docs)
+        all_new_embeddings.append(new_embeddings)
+        session_uploaded_files.add(filename)
+        session_file_hashes[filename] = file_hash
+        processed_filenames.append(filename)
+
+    if all_new_embeddings:
+        combined_embeddings = np.vstack(all_new_embeddings).astype(np.float32, copy=False)
+        
+        if SHARED_INDEX:
+            # The mapped index is read-only: publish a new generation that appends these documents
+            publish_generation(all_new_docs, combined_embeddings)
+        else:
+            if vector_store is None:
+                vector_store = new_vector_index(combined_embeddings)
+                stored_vectors = VectorShards()
+            
+            vector_store.add(combined_embeddings)
+            for new_embeddings in all_new_embeddings:
+                stored_vectors.append(new_embeddings)
+            if lexical_index is None:
+                lexical_index = BM25Index()
+            lexical_index.add(doc['text'] for doc in all_new_docs)
+            all_documents_metadata.extend(all_new_docs)
+        
+        print(f"Added {len(all_new_docs)} total chunks from {len(processed_filenames)} files")
+
+    return processed_filenames
+
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     if vector_store is None or vector_store.ntotal == 0: 
         return jsonify({'error': 'No documents uploaded yet'}), 400
     
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+
+    request_start = time.perf_counter()
     data = request.get_json()
     question = data.get('question')
     if not question: 
         return jsonify({'error': 'No question provided'}), 400
+    # Per-stage timing breakdown, sent to the client in the final "done" frame
+    timings = {}
 
     queries = [question]
     
-    queries = expand_query(question)
+    # Part numbers, names in quotes, etc.: the lexical index finds these without LLM expansion
+    exact_terms = exact_match_terms(question)
+    if not exact_terms:
+        with timed_stage(ASK_STAGE_SECONDS, "expand", timings):
+            queries = expand_query(question)
     
-    embedding_model = get_embedding_model()
-    query_embeddings = embedding_model.encode(queries, convert_to_tensor=True, show_progress_bar=False).cpu().numpy()
+    with timed_stage(ASK_STAGE_SECONDS, "encode", timings):
+        query_embeddings = embed_texts(queries)
 
     k_retrieval = 5
-    distances, ids = vector_store.search(query_embeddings, k_retrieval)
+    with timed_stage(ASK_STAGE_SECONDS, "search", timings):
+        distances, ids = search_vectors(query_embeddings, k_retrieval)
     
-    unique_ids = set()
-    for id_list in ids:
-        for i in id_list:
-            if i != -1 and 0 <= i < len(all_documents_metadata):
-                unique_ids.add(i)
+    with timed_stage(ASK_STAGE_SECONDS, "lexical_search", timings):
+        lexical_ranked = [lexical_index.search(q, LEXICAL_K) for q in queries] if lexical_index else []
     
-    candidate_docs = [all_documents_metadata[i] for i in unique_ids]
+    vector_ranked = [[i for i in id_list if i != -1] for id_list in ids]
+    fused_ids = reciprocal_rank_fusion(vector_ranked + lexical_ranked, RERANK_BUDGET)
+    candidate_docs = [all_documents_metadata[i] for i in fused_ids if 0 <= i < len(all_documents_metadata)]
+    RERANK_CANDIDATES.observe(len(candidate_docs))
+    timings["rerank_candidates"] = len(candidate_docs)
+    timings["expansion_skipped"] = bool(exact_terms)
     
     if not candidate_docs:
-        return Response(stream_with_context(iter(["<div><p>I couldn't find any relevant information in the uploaded documents to answer your question.</p></div>"])))
+        return ndjson_response(iter([
+            ndjson_frame({"type": "sources", "content": []}),
+            ndjson_frame({"type": "token", "content": "<div><p>I couldn't find any relevant information in the uploaded documents to answer your question.</p></div>"}),
+            ndjson_frame({"type": "done", "timings": timings})
+        ]))
 
     # Rerank candidates
-    reranker = get_reranker()
-    rerank_pairs = [[question, doc['text']] for doc in candidate_docs]
-    scores = reranker.predict(rerank_pairs)
+    with timed_stage(ASK_STAGE_SECONDS, "rerank", timings):
+        scores = rerank_scores(question, [doc['text'] for doc in candidate_docs])
     
     doc_scores = list(zip(candidate_docs, scores))
     doc_scores.sort(key=lambda x: x[1], reverse=True)
@@ -779,43 +1792,58 @@ then you have to just one line caption it if available but don't use <img> tag f
 
 Question: {question}"""
     
-    prompt = ChatPromptTemplate.from_template(template)
-    llm = get_llm()
-    rag_chain = prompt | llm | StrOutputParser()
+    with timed_stage(ASK_STAGE_SECONDS, "prompt_build", timings):
+        prompt = ChatPromptTemplate.from_template(template)
+        llm = get_llm()
+        rag_chain = prompt | llm | StrOutputParser()
     
+    sources = build_sources(retrieved_results, question)
+
     def generate():
-        full_response = ""
-        for chunk in rag_chain.stream({"context": context_text, "question": question}):
-            full_response += chunk
-            yield chunk
-        
-        # ✨ Check if we should display images
-        should_show_images = any(keyword in question.lower() for keyword in ['show', 'display', 'image', 'graph', 'chart', 'diagram', 'picture'])
-        
-        sources = []
-        for doc, score in retrieved_results:
-            source_obj = {
-                "source_filename": doc['source_filename'],
-                "page_num": doc.get('page_num', 0),
-                "source_content": doc['text'],
-                "type": doc.get('type', 'unknown'),
-                "score": float(score)
-            }
-            if doc.get('type') in ['image', 'standalone_image']: 
-                source_obj['image_path'] = doc['image_path']
-                source_obj['vision_description'] = doc.get('vision_description', '')
-                source_obj['show_inline'] = should_show_images
-            
-            if doc.get('type') == 'audio':
-                source_obj['start_time'] = doc.get('start_time')
-                source_obj['end_time'] = doc.get('end_time')
-                source_obj['duration'] = doc.get('duration')
-                source_obj['timestamp_display'] = f"{format_timestamp(doc.get('start_time'))} - {format_timestamp(doc.get('end_time'))}"
-            
-            sources.append(source_obj)
-        yield json.dumps({"type": "sources", "content": sources})
+        # Citations and inline images can render while the answer is still generating
+        yield ndjson_frame({"type": "sources", "content": sources})
 
-    return Response(stream_with_context(generate()), mimetype='text/plain')
+        token_count = 0
+        generation_start = time.perf_counter()
+        stream = rag_chain.stream({"context": context_text, "question": question})
+        try:
+            for chunk in stream:
+                if token_count == 0:
+                    # Measured from request arrival: this is the latency the user waits for
+                    ttft = time.perf_counter() - request_start
+                    ASK_STAGE_SECONDS.labels(stage="time_to_first_token").observe(ttft)
+                    timings["time_to_first_token"] = round(ttft, 4)
+                token_count += 1
+                yield ndjson_frame({"type": "token", "content": chunk})
+        except GeneratorExit:
+            # The client disconnected: the finally below closes the Ollama stream right away
+            ASK_CANCELLED.inc()
+            print("Client disconnected, cancelled generation")
+            raise
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield ndjson_frame({"type": "error", "content": str(e)})
+            return
+        finally:
+            stream.close()
+        
+        mark_warm("llm")
+        generation_time = time.perf_counter() - generation_start
+        total_time = time.perf_counter() - request_start
+        ASK_STAGE_SECONDS.labels(stage="generate").observe(generation_time)
+        ASK_STAGE_SECONDS.labels(stage="total").observe(total_time)
+        timings["generate"] = round(generation_time, 4)
+        timings["total"] = round(total_time, 4)
+        # Ollama streams roughly one token per chunk
+        timings["tokens"] = token_count
+        if token_count and generation_time > 0:
+            tokens_per_second = token_count / generation_time
+            ASK_TOKENS_PER_SECOND.observe(tokens_per_second)
+            timings["tokens_per_second"] = round(tokens_per_second, 2)
+        yield ndjson_frame({"type": "done", "timings": timings})
+
+    return ndjson_response(generate())
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe_audio():
@@ -860,6 +1888,7 @@ def session_info():
         'file_indices': session_file_indices,
         'total_documents': len(all_documents_metadata),
         'vector_store_size': vector_store.ntotal if vector_store else 0,
+        'vector_storage': vector_storage_report(),
         'cache_stats': {
             'cached_files': len([d for d in os.listdir(CACHE_DIR) if os.path.isdir(os.path.join(CACHE_DIR, d))]) if os.path.exists(CACHE_DIR) else 0
         }
@@ -869,17 +1898,47 @@ def session_info():
 @app.route('/clear-session', methods=['POST'])
 def clear_session():
     """Clear all uploaded files from the current session."""
-    global all_documents_metadata, vector_store, session_uploaded_files, session_file_hashes, session_file_indices
+    global all_documents_metadata, vector_store, stored_vectors, lexical_index, session_uploaded_files, session_file_hashes, session_file_indices, _index_segments
     
-    all_documents_metadata = []
-    vector_store = None
-    session_uploaded_files.clear()
-    session_file_hashes.clear()
-    session_file_indices.clear()
+    with index_writer():
+        _index_segments = []
+        all_documents_metadata = []
+        vector_store = None
+        stored_vectors = None
+        lexical_index = None
+        session_uploaded_files.clear()
+        session_file_hashes.clear()
+        session_file_indices.clear()
+        if SHARED_INDEX:
+            publish_generation()
     
     return jsonify({'message': 'Session cleared successfully'})
 
 
+@app.route('/assets/<asset_name>')
+def serve_asset(asset_name):
+    """Serve a content-addressed image, or a cached thumbnail of it with ?w=<width>."""
+    match = ASSET_NAME_PATTERN.match(asset_name)
+    if not match or not os.path.exists(asset_path(asset_name)):
+        return jsonify({'error': 'Asset not found'}), 404
+    digest = match.group(1)
+
+    width = request.args.get('w', type=int)
+    if width:
+        # Snap to a fixed set of widths so each asset has a bounded number of thumbnails
+        width = next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+        path, etag = asset_thumbnail(asset_name, width), f"{digest}-w{width}"
+    else:
+        path, etag = asset_path(asset_name), digest
+
+    # The name is the content hash, so the response never changes: browsers revalidate
+    # with If-None-Match at most, and send_file answers that with 304
+    response = send_file(os.path.abspath(path), etag=etag, max_age=ASSET_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 # Serve files from temp directory
 @app.route('/temp/<path:filename>')
 def serve_temp_file(filename):
@@ -891,5 +1950,12 @@ if __name__ == '__main__':
     # Create necessary directories
     os.makedirs('temp', exist_ok=True)
     os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Development server only; for production use: gunicorn -c gunicorn.conf.py app:app
+    debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+
+    # Skip the warm-up in the reloader's parent process; only the serving child needs the models
+    if WARMUP_MODELS and (not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        start_background_warmup()
     
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""Deterministic synthetic documents for the benchmarks: PDFs, DOCX files and audio."""
+import io
+import math
+import random
+import struct
+import wave
+
+from PIL import Image, ImageDraw
+
+WORDS = (
+    "retrieval vector index embedding latency throughput document page chunk image chart "
+    "diagram table model query answer context source cache worker memory disk network "
+    "pipeline stage batch token stream signal frequency sensor turbine pressure valve "
+    "revenue quarter forecast margin growth customer region product release schedule"
+).split()
+
+PART_NUMBERS = [f"PN-{n:05d}" for n in range(100, 160)]
+
+
+def sentences(rng, count):
+    out = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(PART_NUMBERS))
+        out.append(" ".join(words).capitalize() + ".")
+    return out
+
+
+def chart_png(rng, width=480, height=320):
+    """A bar chart with axis labels, so OCR and captioning have something to read."""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    bars = rng.randint(4, 8)
+    bar_width = (width - 60) // bars
+    for i in range(bars):
+        bar_height = rng.randint(20, height - 60)
+        x0 = 40 + i * bar_width
+        draw.rectangle([x0 + 4, height - 30 - bar_height, x0 + bar_width - 4, height - 30],
+                       fill=(rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200)))
+        draw.text((x0 + 6, height - 24), f"Q{i + 1}", fill="black")
+    draw.line([36, 10, 36, height - 30, width - 10, height - 30], fill="black", width=2)
+    draw.text((width // 2 - 60, 8), f"{rng.choice(WORDS).title()} by quarter", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_pdf(pages=20, images_per_page=1, seed=0):
+    import fitz
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = " ".join(sentences(rng, 25))
+        page.insert_textbox(fitz.Rect(50, 50, 545, 500), text, fontsize=9)
+        for i in range(images_per_page):
+            top = 510 + i * 150
+            page.insert_image(fitz.Rect(50, top, 290, top + 140), stream=chart_png(rng))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_docx(paragraphs=60, image_every=15, table_every=20, seed=0):
+    import docx
+    rng = random.Random(seed)
+    document = docx.Document()
+    document.add_heading("Synthetic benchmark report", level=1)
+    for i in range(1, paragraphs + 1):
+        document.add_paragraph(" ".join(sentences(rng, 4)))
+        if image_every and i % image_every == 0:
+            document.add_picture(io.BytesIO(chart_png(rng)))
+        if table_every and i % table_every == 0:
+            table = document.add_table(rows=4, cols=3)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = rng.choice(PART_NUMBERS + WORDS)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_wav(seconds=30, sample_rate=16000, seed=0):
+    """Mono 16-bit WAV of short tone bursts over low noise."""
+    rng = random.Random(seed)
+    frames = bytearray()
+    frequency = 440.0
+    for n in range(seconds * sample_rate):
+        if n % (sample_rate // 2) == 0:
+            frequency = rng.choice((220.0, 330.0, 440.0, 550.0, 660.0))
+        tone = 0.3 * math.sin(2 * math.pi * frequency * n / sample_rate) if (n // 4000) % 2 == 0 else 0.0
+        sample = tone + rng.uniform(-0.02, 0.02)
+        frames += struct.pack("<h", int(max(-1.0, min(1.0, sample)) * 32767))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def make_questions(count, seed=0):
+    rng = random.Random(seed)
+    templates = (
+        "What does the document say about {a} and {b}?",
+        "Show the chart about {a}.",
+        "Summarize the {a} {b} section.",
+        "Which pages mention {p}?",
+    )
+    return [
+        rng.choice(templates).format(a=rng.choice(WORDS), b=rng.choice(WORDS), p=rng.choice(PART_NUMBERS))
+        for _ in range(count)
+    ]
@@ -0,0 +1,64 @@
+"""Offline stand-in for the Ollama chat models with a configurable per-token latency."""
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ANSWER = (
+    "<div><p>The documents describe the <b>retrieval pipeline</b> and its latency per stage. "
+    "The chart shows throughput by quarter, with the largest growth in the last quarter. "
+    "Part numbers and schedules are listed in the tables of the report.</p></div>"
+)
+EXPANSIONS = (
+    "Which stages of the pipeline have the highest latency?\n"
+    "How does throughput change by quarter?\n"
+    "What part numbers are listed in the report tables?"
+)
+
+
+class StubChatModel(BaseChatModel):
+    """Streams a canned reply one whitespace-delimited token at a time."""
+
+    reply: str
+    token_latency: float = 0.02
+    first_token_latency: float = 0.1
+
+    @property
+    def _llm_type(self):
+        return "ollama-stub"
+
+    def _tokens(self):
+        return re.findall(r"\S+\s*", self.reply)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency + self.token_latency * len(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_latency)
+        for token in self._tokens():
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def install(app_module, token_latency=0.02, first_token_latency=0.1, stub_vision=False):
+    """Route every ChatOllama getter in app.py to the stub (and optionally skip BLIP)."""
+    replies = {app_module.LLM_MODEL_NAME: ANSWER}
+
+    def load_stub(model_name):
+        return StubChatModel(
+            reply=replies.get(model_name, EXPANSIONS),
+            token_latency=token_latency,
+            first_token_latency=first_token_latency,
+        )
+
+    app_module._load_chat_ollama = load_stub
+    app_module._preload_ollama = lambda model_name: None
+    app_module._llm = app_module._ex_llm = app_module._vision_llm = None
+
+    if stub_vision:
+        app_module.describe_image_with_vision_model = (
+            lambda image_path, context_before="", context_after="": "Image Description: [stub chart]"
+        )
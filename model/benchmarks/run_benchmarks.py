@@ -0,0 +1,367 @@
+"""Offline benchmark suite for ingestion throughput and /ask latency.
+
+Generates synthetic PDF, DOCX and audio files, times process_pdf, process_docx
+and process_audio plus embedding, then serves the app on a local port and
+drives /ask concurrently, timing the sources frame and the first token frame.
+Ollama is replaced by a stub with a configurable per-token latency; the
+Hugging Face models must already be in the local cache (HF_HUB_OFFLINE is
+forced on).
+
+The default audio fixture is tone bursts, not speech, so its numbers cover
+decoding and the transcribe pass only; pass --audio-file with a speech
+recording to measure real transcription and chunking.
+
+Usage:
+    python benchmarks/run_benchmarks.py --output run.json
+    python benchmarks/run_benchmarks.py --output new.json --compare run.json
+    python benchmarks/run_benchmarks.py --audio-file speech.wav
+"""
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.dirname(BENCH_DIR)
+
+
+def peak_rss_mb():
+    """Peak RSS of the whole process so far (cumulative across stages)."""
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def current_rss_mb():
+    """Current RSS from /proc (Linux); None elsewhere."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_delta_mb(before):
+    after = current_rss_mb()
+    return after - before if after is not None and before is not None else None
+
+
+def fmt_seconds(value):
+    return f"{value:.3f}s" if value is not None else "n/a"
+
+
+def percentiles(values):
+    import numpy as np
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(np.mean(values))}
+
+
+def setup_app(args, workdir):
+    os.environ["WARMUP_MODELS"] = "0"
+    os.environ["SHARED_INDEX"] = "0"
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    sys.path.insert(0, MODEL_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    # process_* write extracted media to ./temp; keep that and the cache out of the repo
+    os.chdir(workdir)
+
+    import app
+    import ollama_stub
+    app.CACHE_DIR = os.path.join(workdir, "cache")
+    ollama_stub.install(
+        app,
+        token_latency=args.token_latency,
+        first_token_latency=args.first_token_latency,
+        stub_vision=args.stub_vision,
+    )
+    return app
+
+
+def load_models(app, args):
+    """Load models up front so their load time does not leak into the stage timings."""
+    loaders = [app.get_embedding_model, app.get_reranker, app.get_llm, app.get_ex_llm]
+    if args.audio_seconds or args.audio_file:
+        loaders.append(app.get_whisper_model)
+    if not args.stub_vision:
+        loaders.append(app.get_blip_model)
+    start = time.perf_counter()
+    for loader in loaders:
+        loader()
+    return time.perf_counter() - start
+
+
+def bench_ingest(app, kind, filename, data, units, process):
+    """Time one processing function plus embedding; returns the result and the docs/embeddings."""
+    from werkzeug.datastructures import FileStorage
+    storage = FileStorage(stream=io.BytesIO(data), filename=filename)
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    docs = process(storage)
+    process_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = [doc["text"] for doc in docs]
+    embeddings = app.embed_texts(texts)
+    embed_seconds = time.perf_counter() - start
+
+    total = process_seconds + embed_seconds
+    result = {
+        "file": filename,
+        "bytes": len(data),
+        "units": units[0],
+        "unit_name": units[1],
+        "chunks": len(docs),
+        "process_seconds": process_seconds,
+        "embed_seconds": embed_seconds,
+        f"{units[1]}_per_sec": units[0] / total if total else None,
+        "chunks_per_sec": len(docs) / total if total else None,
+        # Growth of resident memory during this file, and the process-wide peak so far
+        "rss_delta_mb": rss_delta_mb(rss_before),
+        "peak_rss_mb_cumulative": peak_rss_mb(),
+    }
+    print(f"  {kind:5s} {units[0]} {units[1]} -> {len(docs)} chunks in {total:.2f}s "
+          f"({result[f'{units[1]}_per_sec']:.2f} {units[1]}/s, {result['chunks_per_sec']:.2f} chunks/s)")
+    return result, docs, embeddings
+
+
+def run_ingestion(app, args):
+    import fixtures
+    inputs = []
+    if args.pdf_pages:
+        inputs.append(("pdf", "bench.pdf", fixtures.make_pdf(args.pdf_pages, seed=args.seed),
+                       (args.pdf_pages, "pages"), app.process_pdf))
+    if args.docx_paragraphs:
+        inputs.append(("docx", "bench.docx", fixtures.make_docx(args.docx_paragraphs, seed=args.seed),
+                       (args.docx_paragraphs, "paragraphs"), app.process_docx))
+    if args.audio_file:
+        with open(args.audio_file, "rb") as f:
+            audio = f.read()
+        inputs.append(("audio", os.path.basename(args.audio_file), audio,
+                       (audio_duration(args.audio_file, args.audio_seconds), "audio_seconds"), app.process_audio))
+    elif args.audio_seconds:
+        # Tone bursts, not speech: Whisper finds few or no segments, so these numbers
+        # measure decoding and the VAD/transcribe pass, not chunking of real transcripts
+        inputs.append(("audio", "bench.wav", fixtures.make_wav(args.audio_seconds, seed=args.seed),
+                       (args.audio_seconds, "audio_seconds"), app.process_audio))
+
+    results = {}
+    uploads = []
+    for kind, filename, data, units, process in inputs:
+        results[kind], docs, embeddings = bench_ingest(app, kind, filename, data, units, process)
+        if not docs:
+            # Nothing to index (e.g. no speech found); /upload would skip the file too
+            print(f"  {kind}: no chunks produced, not uploading {filename}")
+            continue
+        # Seed the cache so populating the live index through /upload skips reprocessing
+        app.save_to_cache(hashlib.sha256(data).hexdigest(), docs, embeddings)
+        uploads.append((filename, data))
+    return results, uploads
+
+
+def audio_duration(path, fallback):
+    """Duration of a WAV file in seconds; other formats use --audio-seconds."""
+    import wave
+    try:
+        with wave.open(path, "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return fallback
+
+
+def upload(port, uploads):
+    boundary = "----rag-benchmark-boundary"
+    body = io.BytesIO()
+    for filename, data in uploads:
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; "
+                   f"filename=\"{filename}\"\r\nContent-Type: application/octet-stream\r\n\r\n".encode())
+        body.write(data)
+        body.write(b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request("POST", "/upload", body=body.getvalue(),
+                 headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    response = conn.getresponse()
+    payload = response.read()
+    conn.close()
+    if response.status != 200:
+        raise SystemExit(f"/upload failed: {response.status} {payload[:200]!r}")
+
+
+def ask_once(port, question):
+    """POST /ask and return (time to first token frame, total seconds, time to sources frame, done timings)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    start = time.perf_counter()
+    conn.request("POST", "/ask", body=json.dumps({"question": question}),
+                 headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    if response.status != 200:
+        conn.close()
+        raise RuntimeError(f"/ask failed with status {response.status}")
+    first_token = sources_at = None
+    timings = {}
+    # NDJSON frames: sources, token..., done
+    for line in response:
+        if not line.strip():
+            continue
+        frame = json.loads(line)
+        if frame["type"] == "sources" and sources_at is None:
+            sources_at = time.perf_counter() - start
+        elif frame["type"] == "token" and first_token is None:
+            first_token = time.perf_counter() - start
+        elif frame["type"] == "done":
+            timings = frame.get("timings", {})
+        elif frame["type"] == "error":
+            raise RuntimeError(f"/ask stream error: {frame['content']}")
+    total = time.perf_counter() - start
+    conn.close()
+    return first_token, total, sources_at, timings
+
+
+def run_ask_load(app, args, uploads):
+    import fixtures
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    port = server.server_port
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        upload(port, uploads)
+        questions = fixtures.make_questions(args.ask_requests, seed=args.seed)
+        ask_once(port, questions[0])  # first request pays one-off costs (tokenizer caches, etc.)
+
+        errors = 0
+        samples = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for future in [pool.submit(ask_once, port, q) for q in questions]:
+                try:
+                    samples.append(future.result())
+                except Exception as e:
+                    errors += 1
+                    print(f"  /ask error: {e}")
+        wall = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    result = {
+        "requests": len(questions),
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "wall_seconds": wall,
+        "requests_per_sec": len(samples) / wall if wall else None,
+        "latency_seconds": percentiles([s[1] for s in samples]),
+        "ttft_seconds": percentiles([s[0] for s in samples if s[0] is not None]),
+        "sources_frame_seconds": percentiles([s[2] for s in samples if s[2] is not None]),
+        "rerank_candidates": percentiles([s[3]["rerank_candidates"] for s in samples if "rerank_candidates" in s[3]]),
+        "expansion_skipped": sum(1 for s in samples if s[3].get("expansion_skipped")),
+        "peak_rss_mb_cumulative": peak_rss_mb(),
+    }
+    lat, ttft = result["latency_seconds"], result["ttft_seconds"]
+    print(f"  /ask x{len(questions)} @ {args.concurrency}: {errors} errors | p50 {fmt_seconds(lat['p50'])} "
+          f"p95 {fmt_seconds(lat['p95'])} p99 {fmt_seconds(lat['p99'])} | "
+          f"TTFT p50 {fmt_seconds(ttft['p50'])} p95 {fmt_seconds(ttft['p95'])}")
+    if result["rerank_candidates"]["mean"] is not None:
+        print(f"  rerank candidates/query: mean {result['rerank_candidates']['mean']:.1f}, "
+              f"expansion skipped on {result['expansion_skipped']} of {len(samples)} queries")
+    return result
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path, report):
+    with open(baseline_path) as f:
+        baseline = flatten(json.load(f)["results"])
+    current = flatten(report["results"])
+    print(f"\nComparison with {baseline_path}:")
+    print(f"{'metric':<48} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(baseline) & set(current)):
+        old, new = baseline[name], current[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        print(f"{name:<48} {old:>12.4g} {new:>12.4g} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--docx-paragraphs", type=int, default=60)
+    parser.add_argument("--audio-seconds", type=int, default=30,
+                        help="length of the synthetic tone fixture (not speech: measures decoding only)")
+    parser.add_argument("--audio-file", help="speech recording to benchmark instead of the synthetic fixture")
+    parser.add_argument("--ask-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--token-latency", type=float, default=0.02, help="stub LLM seconds per token")
+    parser.add_argument("--first-token-latency", type=float, default=0.1, help="stub LLM seconds before the first token")
+    parser.add_argument("--stub-vision", action="store_true", help="skip BLIP and the caption LLM for images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        app = setup_app(args, workdir)
+        print("Loading models...")
+        model_load_seconds = load_models(app, args)
+        print("Ingestion:")
+        ingestion, uploads = run_ingestion(app, args)
+        print("Ask:")
+        if uploads:
+            ask = run_ask_load(app, args, uploads)
+        else:
+            print("  no documents were indexed, skipping /ask")
+            ask = {}
+
+    report = {
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_backend": os.environ.get("EMBEDDING_BACKEND", "torch"),
+            "reranker_backend": os.environ.get("RERANKER_BACKEND", "torch"),
+        },
+        "results": {
+            "model_load_seconds": model_load_seconds,
+            "ingestion": ingestion,
+            "ask": ask,
+            "peak_rss_mb_cumulative": peak_rss_mb(),
+        },
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {output}")
+    if baseline:
+        compare(baseline, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Startup-latency benchmark for the RAG backend.
+
+Imports app.py in a fresh interpreter with ``-X importtime``, prints the
+slowest imports and fails when importing the app (everything needed before
+Flask can answer ``/``) takes longer than the budget.
+
+Usage:
+    python benchmarks/startup_latency.py [--budget 1.0] [--top 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must never be imported while app.py is loading
+HEAVY_MODULES = (
+    "torch", "transformers", "sentence_transformers", "faster_whisper",
+    "langchain", "langchain_core", "langchain_ollama", "faiss", "fitz",
+    "docx", "pytesseract", "ollama",
+)
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(runs):
+    """Import app.py ``runs`` times in fresh interpreters and return the fastest run."""
+    best = None
+    for _ in range(runs):
+        env = dict(os.environ, WARMUP_MODELS="0")
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app"],
+            cwd=MODEL_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            raise SystemExit("Importing app.py failed")
+        rows = parse_importtime(result.stderr)
+        if best is None or wall < best["wall_seconds"]:
+            best = {"wall_seconds": wall, "rows": rows}
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=1.0, help="maximum seconds to import app.py")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to try; the fastest counts")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to print")
+    parser.add_argument("--json", dest="json_path", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    best = measure(args.runs)
+    rows = best["rows"]
+    app_row = next((r for r in rows if r[0] == "app"), None)
+    import_seconds = app_row[2] / 1e6 if app_row else best["wall_seconds"]
+    heavy = sorted({r[0] for r in rows if r[0].split(".")[0] in HEAVY_MODULES})
+
+    print(f"Interpreter + import wall time: {best['wall_seconds']:.3f}s")
+    print(f"import app (cumulative):        {import_seconds:.3f}s (budget {args.budget:.3f}s)")
+    print(f"\nTop {args.top} imports by cumulative time:")
+    print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>10.1f}  {name}")
+    if heavy:
+        print("\nHeavy modules imported at startup: " + ", ".join(heavy))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({
+                "wall_seconds": best["wall_seconds"],
+                "import_seconds": import_seconds,
+                "budget_seconds": args.budget,
+                "heavy_modules": heavy,
+                "imports": [
+                    {"module": name, "self_us": self_us, "cumulative_us": cumulative_us}
+                    for name, self_us, cumulative_us in rows
+                ],
+            }, f, indent=2)
+
+    if import_seconds > args.budget or heavy:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
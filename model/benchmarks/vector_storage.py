@@ -0,0 +1,114 @@
+"""Memory and recall report for the compressed vector storage modes.
+
+Builds the live index for every VECTOR_STORAGE mode with app.new_vector_index,
+then compares recall@k against exact flat search, with and without the exact
+re-scoring step, along with bytes per vector and query latency. Uses clustered
+synthetic unit vectors, or real embeddings from a cache directory.
+
+Usage:
+    python benchmarks/vector_storage.py --vectors 100000 --output storage.json
+    python benchmarks/vector_storage.py --from-cache cache/
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.dirname(BENCH_DIR)
+
+
+def synthetic_vectors(np, count, dimension, clusters, seed):
+    """Unit vectors around random centroids, shaped like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, size=count)] + 0.6 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def cached_vectors(np, cache_dir):
+    arrays = [np.load(path) for path in sorted(glob.glob(os.path.join(cache_dir, "*", "embeddings-*.npy")))]
+    if not arrays:
+        raise SystemExit(f"No cached embeddings found under {cache_dir}")
+    return np.vstack(arrays).astype(np.float32)
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--from-cache", help="use embeddings-*.npy files from this cache directory instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    os.environ["WARMUP_MODELS"] = "0"
+    sys.path.insert(0, MODEL_DIR)
+    import faiss
+    import numpy as np
+    import app
+
+    if args.from_cache:
+        data = cached_vectors(np, args.from_cache)
+    else:
+        data = synthetic_vectors(np, args.vectors + args.queries, args.dimension, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed)
+    rng.shuffle(data)
+    queries, base = data[:args.queries], data[args.queries:]
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, args.k)
+
+    results = {}
+    print(f"{len(base)} vectors, {len(queries)} queries, d={base.shape[1]}, k={args.k}, rescore x{app.RESCORE_FACTOR}")
+    print(f"{'mode':<8} {'bytes/vec':>10} {'index MB':>9} {'recall':>8} {'+rescore':>9} {'ms/query':>9} {'+rescore':>9}")
+    for mode in app.VECTOR_STORAGE_MODES:
+        start = time.perf_counter()
+        index = app.new_vector_index(base, storage=mode)
+        index.add(base)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        stored_dtype = np.float32 if mode == "float32" else np.float16
+        stored = app.VectorShards([base.astype(stored_dtype)])
+        start = time.perf_counter()
+        _, shortlist = index.search(queries, min(args.k * app.RESCORE_FACTOR, len(base)))
+        _, rescored = app.rescore(queries, shortlist, stored, args.k)
+        rescore_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        code_size = index.sa_code_size()
+        results[mode] = {
+            "index_bytes_per_vector": code_size,
+            "index_mb": code_size * len(base) / 2**20,
+            "stored_vector_mb": stored.nbytes / 2**20,
+            "build_seconds": build_seconds,
+            "recall_at_k": recall_at_k(found, truth),
+            "recall_at_k_rescored": recall_at_k(rescored, truth),
+            "ms_per_query": search_ms,
+            "ms_per_query_rescored": rescore_ms,
+        }
+        r = results[mode]
+        print(f"{mode:<8} {code_size:>10} {r['index_mb']:>9.1f} {r['recall_at_k']:>8.3f} "
+              f"{r['recall_at_k_rescored']:>9.3f} {search_ms:>9.3f} {rescore_ms:>9.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "rescore_factor": app.RESCORE_FACTOR, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Production serving: gunicorn -c gunicorn.conf.py app:app
+#
+# The app is preloaded in the master so the torch fp32 model weights are loaded
+# once and shared copy-on-write by the forked workers; fork-unsafe models load per
+# worker. Workers map the published FAISS
+# index and metadata read-only from INDEX_DIR; uploads are serialized by a file
+# lock and published as new index generations (see "Shared Index" in app.py).
+import multiprocessing
+import os
+import shutil
+
+# Must be set before app.py is imported
+os.environ.setdefault("SHARED_INDEX", "1")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(os.getcwd(), "index", "prometheus"))
+
+# Metric files from a previous run would be summed into this one; the directory
+# must exist before the preloaded app creates its histograms
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+preload_app = True
+# Uploads run OCR, BLIP and captioning inline; give them time to finish
+timeout = int(os.environ.get("TIMEOUT", 600))
+graceful_timeout = 30
+
+
+def when_ready(server):
+    # Runs in the master before any worker is forked. Only the torch fp32 weights are
+    # loaded here; anything that starts thread pools while loading (Whisper, ONNX
+    # Runtime, torch-int8 quantization) or runs inference must happen per worker.
+    import app
+    os.makedirs("temp", exist_ok=True)
+    os.makedirs(app.CACHE_DIR, exist_ok=True)
+    if app.WARMUP_MODELS:
+        app.load_fork_safe_models()
+
+
+def post_fork(server, worker):
+    # One intra-op thread per core share: without this every worker starts a thread per
+    # core in torch and ONNX Runtime, i.e. cores^2 compute threads. INFERENCE_THREADS overrides it.
+    import app
+    threads = int(os.environ.get("INFERENCE_THREADS", 0)) or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+    app.configure_worker_threads(threads)
+
+
+def post_worker_init(worker):
+    import app
+    app.sync_shared_index()
+    if app.WARMUP_MODELS:
+        # Loads the remaining models (Whisper, ONNX/int8 backends) in this worker and warms all of them
+        app.start_background_warmup()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
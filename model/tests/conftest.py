@@ -0,0 +1,6 @@
+import os
+import sys
+
+# app.py is a top-level module in model/, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WARMUP_MODELS", "0")
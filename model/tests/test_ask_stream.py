@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("prometheus_client")
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+import app  # noqa: E402
+from flask import json  # noqa: E402
+from langchain_core.runnables import RunnableGenerator, RunnableSequence  # noqa: E402
+
+DOCS = [
+    {"text": "The turbine valve PN-00123 is inspected weekly.", "source_filename": "report.pdf", "page_num": 1, "type": "text"},
+    {"text": "Revenue grew in the last quarter.", "source_filename": "report.pdf", "page_num": 2, "type": "text"},
+]
+ANSWER = ["<div>", "The valve ", "is inspected ", "weekly.", "</div>"]
+
+
+def fake_llm(chunks, fail_after=None):
+    """A streaming chat model stand-in."""
+    def transform(prompts):
+        for _ in prompts:
+            pass
+        for i, chunk in enumerate(chunks):
+            if i == fail_after:
+                raise RuntimeError("connection to the model was lost")
+            yield chunk
+    return RunnableGenerator(transform)
+
+
+class StreamSpy:
+    """Wraps the chain's stream; unlike a generator, it is not closed by garbage collection."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._stream)
+
+    def close(self):
+        self.closed = True
+        self._stream.close()
+
+
+@pytest.fixture
+def ask(monkeypatch):
+    vectors = np.eye(len(DOCS), 4, dtype=np.float32)
+    index = faiss.IndexFlatL2(4)
+    index.add(vectors)
+    lexical = app.BM25Index()
+    lexical.add(doc["text"] for doc in DOCS)
+    monkeypatch.setattr(app, "vector_store", index)
+    monkeypatch.setattr(app, "stored_vectors", app.VectorShards([vectors]))
+    monkeypatch.setattr(app, "lexical_index", lexical)
+    monkeypatch.setattr(app, "all_documents_metadata", [dict(doc) for doc in DOCS])
+    monkeypatch.setattr(app, "expand_query", lambda question: [question])
+    monkeypatch.setattr(app, "embed_texts", lambda texts: np.tile(vectors[:1], (len(texts), 1)))
+    monkeypatch.setattr(app, "rerank_scores", lambda question, texts: [float(len(texts) - i) for i in range(len(texts))])
+    streams = []
+    chain_stream = RunnableSequence.stream
+
+    def spy_stream(self, *args, **kwargs):
+        streams.append(StreamSpy(chain_stream(self, *args, **kwargs)))
+        return streams[-1]
+    monkeypatch.setattr(RunnableSequence, "stream", spy_stream)
+
+    def post(question="When is valve PN-00123 inspected?", **llm_kwargs):
+        monkeypatch.setattr(app, "get_llm", lambda: fake_llm(ANSWER, **llm_kwargs))
+        return app.app.test_client().post("/ask", json={"question": question})
+
+    post.streams = streams
+    return post
+
+
+def frames(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_frames_are_sources_then_tokens_then_done(ask):
+    response = ask()
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["X-Accel-Buffering"] == "no"
+    received = frames(response)
+    assert [frame["type"] for frame in received] == ["sources"] + ["token"] * len(ANSWER) + ["done"]
+    assert received[0]["content"][0]["source_content"] == DOCS[0]["text"]
+    assert "".join(frame["content"] for frame in received[1:-1]) == "".join(ANSWER)
+    timings = received[-1]["timings"]
+    assert timings["tokens"] == len(ANSWER)
+    assert timings["expansion_skipped"] is True
+    assert {"encode", "search", "rerank", "time_to_first_token", "total"} <= set(timings)
+    assert [stream.closed for stream in ask.streams] == [True]
+
+
+def test_no_candidates_sends_a_fixed_answer(ask, monkeypatch):
+    monkeypatch.setattr(app, "all_documents_metadata", [])
+    received = frames(ask())
+    assert [frame["type"] for frame in received] == ["sources", "token", "done"]
+    assert received[0]["content"] == []
+    assert "couldn't find any relevant information" in received[1]["content"]
+    assert received[2]["timings"]["rerank_candidates"] == 0
+
+
+def test_mid_stream_failure_ends_with_an_error_frame(ask):
+    received = frames(ask(fail_after=2))
+    assert [frame["type"] for frame in received] == ["sources", "token", "token", "error"]
+    assert "connection to the model was lost" in received[-1]["content"]
+    assert [stream.closed for stream in ask.streams] == [True]
+
+
+def test_closing_the_response_cancels_generation(ask):
+    before = app.REGISTRY.get_sample_value("rag_ask_cancelled_total") or 0
+    response = ask()
+    chunks = iter(response.response)
+    assert json.loads(next(chunks))["type"] == "sources"
+    assert json.loads(next(chunks))["type"] == "token"
+    response.close()
+    assert [stream.closed for stream in ask.streams] == [True]
+    assert app.REGISTRY.get_sample_value("rag_ask_cancelled_total") == before + 1
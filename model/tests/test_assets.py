@@ -0,0 +1,87 @@
+import io
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("prometheus_client")
+import app  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def png_bytes(width=800, height=400, color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "ASSET_DIR", str(tmp_path / "assets"))
+    monkeypatch.setattr(app, "THUMBNAIL_DIR", str(tmp_path / "assets" / "thumbs"))
+    return app.app.test_client()
+
+
+def test_identical_bytes_are_stored_once(client, tmp_path):
+    data = png_bytes()
+    first = app.store_image_asset(data, "PNG")
+    second = app.store_image_asset(data, "png")
+    assert first == second
+    assert app.ASSET_NAME_PATTERN.match(first)
+    files = [name for _, _, names in os.walk(tmp_path / "assets") for name in names]
+    assert files == [first]
+    assert app.store_image_asset(png_bytes(color="blue"), "png") != first
+
+
+def test_asset_is_served_with_immutable_cache_headers(client):
+    data = png_bytes()
+    name = app.store_image_asset(data, "png")
+    response = client.get(f"/assets/{name}")
+    assert response.status_code == 200
+    assert response.data == data
+    assert "public" in response.cache_control
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app.ASSET_MAX_AGE
+
+
+def test_if_none_match_returns_304(client):
+    name = app.store_image_asset(png_bytes(), "png")
+    etag = client.get(f"/assets/{name}").headers["ETag"]
+    response = client.get(f"/assets/{name}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_thumbnail_width_snaps_and_is_reused(client, monkeypatch):
+    name = app.store_image_asset(png_bytes(), "png")
+    response = client.get(f"/assets/{name}?w=200")
+    assert response.status_code == 200
+    assert response.headers["ETag"].strip('"').endswith("-w320")
+    with Image.open(io.BytesIO(response.data)) as thumbnail:
+        assert thumbnail.size == (320, 160)
+
+    # The second request is served from disk without decoding the original again
+    def fail(*args, **kwargs):
+        raise AssertionError("thumbnail was regenerated")
+    monkeypatch.setattr(app.Image, "open", fail)
+    again = client.get(f"/assets/{name}?w=320")
+    assert again.status_code == 200
+    assert again.data == response.data
+
+
+def test_thumbnail_wider_than_the_largest_size_snaps_down(client):
+    name = app.store_image_asset(png_bytes(width=2000, height=1000), "png")
+    response = client.get(f"/assets/{name}?w=5000")
+    assert response.headers["ETag"].strip('"').endswith(f"-w{app.THUMBNAIL_WIDTHS[-1]}")
+    with Image.open(io.BytesIO(response.data)) as thumbnail:
+        assert thumbnail.width == app.THUMBNAIL_WIDTHS[-1]
+
+
+@pytest.mark.parametrize("asset_name", [
+    "not-a-hash.png",
+    "../app.py",
+    "A" * 64 + ".png",
+    "0" * 64 + ".png",
+])
+def test_bad_or_unknown_names_are_404(client, asset_name):
+    assert client.get(f"/assets/{asset_name}").status_code == 404
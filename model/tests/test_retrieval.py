@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("prometheus_client")
+import app  # noqa: E402
+
+
+DOCS = [
+    "Turbine pressure valve PN-00123 inspection schedule",
+    "Revenue growth by quarter and region",
+    "Sensor chart for the turbine",
+    "Release schedule for the product",
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    bm25 = app.BM25Index(max_df=1.0)
+    bm25.add(DOCS)
+    monkeypatch.setattr(app, "lexical_index", bm25)
+    return bm25
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert app.tokenize("See PN-00123 and v2.1, page 5.") == ["see", "pn-00123", "and", "v2.1", "page", "5"]
+
+
+def test_tokenize_keeps_non_ascii_letters():
+    assert app.tokenize("Café naïve résumé 東京") == ["café", "naïve", "résumé", "東京"]
+
+
+def test_bm25_matches_non_ascii_terms():
+    bm25 = app.BM25Index(max_df=1.0)
+    bm25.add(["Report by Jürgen Müller", "Tōkyō office 東京 numbers"])
+    assert bm25.search("müller", 5) == [0]
+    assert bm25.search("東京", 5) == [1]
+
+
+def test_bm25_ranks_matching_documents(index):
+    assert index.search("PN-00123", 5) == [0]
+    assert index.search("turbine", 5) == [2, 0]  # the shorter chunk scores higher
+    assert sorted(index.search("revenue schedule", 5)) == [0, 1, 3]
+    assert index.search("zebra", 5) == []
+
+
+def test_bm25_skips_stopwords_and_frequent_terms():
+    bm25 = app.BM25Index(max_df=0.5)
+    bm25.add(DOCS)
+    assert "the" not in bm25
+    assert bm25.search("the", 5) == []
+    # "schedule" is in half of the chunks, which is still under the cutoff
+    assert bm25.search("schedule", 5) == [3, 0]
+    bm25.add(["schedule"])
+    assert bm25.search("schedule", 5) == []
+
+
+def test_bm25_extended_leaves_original_untouched(index):
+    extended = index.extended(["zebra crossing", "zebra"])
+    assert index.doc_count == len(DOCS)
+    assert extended.doc_count == len(DOCS) + 2
+    assert extended.search("zebra", 5) == [5, 4]
+    assert extended.search("turbine", 5) == index.search("turbine", 5)
+
+
+def test_bm25_save_and_load_round_trip(index, tmp_path):
+    index.save(tmp_path)
+    loaded = app.BM25Index.load(tmp_path)
+    assert isinstance(loaded._arrays[0], np.memmap)
+    for query in ("turbine", "PN-00123", "revenue schedule"):
+        assert loaded.search(query, 5) == index.search(query, 5)
+    # Extending mapped postings copies them instead of writing to the read-only map
+    assert loaded.extended(["zebra turbine"]).search("zebra", 5) == [len(DOCS)]
+
+
+def test_reciprocal_rank_fusion_prefers_ids_ranked_by_several_lists():
+    assert app.reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], 2) == [1, 3]
+    assert app.reciprocal_rank_fusion([[5], [6, 7]], 10) == [5, 6, 7]
+    assert app.reciprocal_rank_fusion([], 3) == []
+
+
+def test_exact_match_terms(index):
+    assert app.exact_match_terms("What is on page 5?") == []
+    assert app.exact_match_terms("Where is PN-00123 installed?") == ["pn-00123"]
+    assert app.exact_match_terms('Show the "revenue growth" chart') == ["revenue", "growth"]
+    assert app.exact_match_terms("What about PN-99999?") == []
+
+
+def test_exact_match_terms_skips_terms_search_would_not_score(monkeypatch):
+    bm25 = app.BM25Index(max_df=0.5)
+    bm25.add(["PN-00123 valve", "PN-00123 pump", "PN-00123 seal", "PN-00456 gasket"])
+    monkeypatch.setattr(app, "lexical_index", bm25)
+    assert "pn-00123" in bm25 and not bm25.searchable("pn-00123")
+    assert bm25.search("PN-00123", 5) == []
+    assert app.exact_match_terms("Where is PN-00123 used?") == []
+    assert app.exact_match_terms("Where is PN-00456 used?") == ["pn-00456"]
+
+
+def test_exact_match_terms_without_index(monkeypatch):
+    monkeypatch.setattr(app, "lexical_index", None)
+    assert app.exact_match_terms("PN-00123") == []
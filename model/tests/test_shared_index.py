@@ -0,0 +1,149 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("prometheus_client")
+pytest.importorskip("faiss")
+import app  # noqa: E402
+
+DIMENSION = 8
+FILES = {
+    "a.pdf": ["turbine valve PN-00123", "pressure sensor chart", "inspection schedule"],
+    "b.pdf": ["revenue by quarter", "zebra crossing permit"],
+}
+
+
+@pytest.fixture
+def shared(monkeypatch, tmp_path):
+    """A fresh shared-index process state, with every test file already in the cache."""
+    monkeypatch.setattr(app, "SHARED_INDEX", True)
+    monkeypatch.setattr(app, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(app, "CACHE_DIR", str(tmp_path / "cache"))
+    for name, value in (
+        ("_index_generation", None), ("_index_segments", []), ("all_documents_metadata", []),
+        ("vector_store", None), ("stored_vectors", None), ("lexical_index", None),
+        ("session_uploaded_files", set()), ("session_file_hashes", {}), ("session_file_indices", {}),
+    ):
+        monkeypatch.setattr(app, name, value)
+
+    rng = np.random.default_rng(0)
+    for filename, texts in FILES.items():
+        docs = [{"text": text, "source_filename": filename, "page_num": i + 1, "type": "text"} for i, text in enumerate(texts)]
+        app.save_to_cache(file_hash(filename), docs, rng.normal(size=(len(texts), DIMENSION)).astype(np.float32))
+    return app.app.test_client()
+
+
+def file_hash(filename):
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()
+
+
+def upload(client, filename):
+    response = client.post(
+        "/upload", data={"files": [(io.BytesIO(filename.encode("utf-8")), filename)]}, content_type="multipart/form-data"
+    )
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["filenames"]
+
+
+def generations():
+    return sorted(d for d in os.listdir(app.INDEX_DIR) if d.startswith("gen-"))
+
+
+def remap():
+    """Map the current generation from scratch, as a freshly forked worker would."""
+    app._index_generation = None
+    app.sync_shared_index()
+
+
+def test_upload_clear_and_reupload_cycle(shared, monkeypatch):
+    index_builds = []
+    new_vector_index = app.new_vector_index
+    monkeypatch.setattr(app, "new_vector_index", lambda vectors: index_builds.append(len(vectors)) or new_vector_index(vectors))
+
+    assert upload(shared, "a.pdf") == ["a.pdf"]
+    assert upload(shared, "b.pdf") == ["b.pdf"]
+    assert upload(shared, "b.pdf") == []  # unchanged file: no new generation
+    assert generations() == ["gen-000001", "gen-000002"]
+    # The second upload extended the first generation's index instead of building a new one
+    assert index_builds == [3]
+
+    remap()
+    assert app._index_generation == "gen-000002"
+    assert app._index_segments == ["000001", "000002"]
+    assert len(app.all_documents_metadata) == 5
+    assert app.all_documents_metadata[3]["text"] == "revenue by quarter"
+    assert app.vector_store.ntotal == app.stored_vectors.ntotal == 5
+    assert app.lexical_index.search("zebra", 5) == [4]
+    assert app.session_file_indices["b.pdf"] == {"start": 3, "end": 5, "count": 2}
+    # Earlier segments are shared with the previous generation, not rewritten
+    first, second = (os.path.join(app.INDEX_DIR, g, "metadata-000001.jsonl") for g in generations())
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+
+    assert shared.post("/clear-session").status_code == 200
+    assert generations() == ["gen-000002", "gen-000003"]
+    remap()
+    assert len(app.all_documents_metadata) == 0
+    assert app.vector_store is None
+    assert app.session_uploaded_files == set()
+
+    assert upload(shared, "a.pdf") == ["a.pdf"]
+    assert generations() == ["gen-000003", "gen-000004"]
+    remap()
+    assert app._index_segments == ["000004"]
+    assert [doc["text"] for doc in app.all_documents_metadata] == FILES["a.pdf"]
+    assert app.vector_store.ntotal == 3
+    assert app.lexical_index.search("zebra", 5) == []
+    assert app.session_file_indices["a.pdf"] == {"start": 0, "end": 3, "count": 3}
+
+
+def test_generation_from_another_embedding_backend_is_ignored(shared, monkeypatch):
+    upload(shared, "a.pdf")
+    monkeypatch.setattr(app, "embedding_fingerprint", lambda: "another-backend")
+    remap()
+    assert app._index_generation == "gen-000001"
+    assert app.vector_store is None
+    assert len(app.all_documents_metadata) == 0
+    assert app.session_uploaded_files == set()
+
+    # The next upload re-embeds under the new backend and starts a new index rather than
+    # mixing in the other backend's vectors
+    monkeypatch.setattr(app, "embed_texts", lambda texts: np.ones((len(texts), DIMENSION), dtype=np.float32))
+    assert upload(shared, "b.pdf") == ["b.pdf"]
+    remap()
+    assert app._index_segments == ["000002"]
+    assert [doc["text"] for doc in app.all_documents_metadata] == FILES["b.pdf"]
+    assert app.vector_store.ntotal == 2
+
+
+def test_legacy_generation_is_read_and_extended(shared):
+    upload(shared, "a.pdf")
+    # Rewrite gen-000001 in the layout published before segments and BM25 arrays existed
+    path = os.path.join(app.INDEX_DIR, "gen-000001")
+    for name in app.SEGMENT_FILES:
+        os.rename(app._segment_file(path, "000001", name), os.path.join(path, name))
+    for name in app.BM25Index.FILES:
+        os.remove(os.path.join(path, f"bm25_{name}.npy"))
+    with open(os.path.join(path, "session.json")) as f:
+        session = json.load(f)
+    del session["segments"]
+    with open(os.path.join(path, "session.json"), "w") as f:
+        json.dump(session, f)
+
+    remap()
+    assert app._index_segments == [""]
+    assert len(app.all_documents_metadata) == 3
+    assert app.stored_vectors.ntotal == 3
+    # The postings are re-tokenized from the metadata
+    assert app.lexical_index.search("PN-00123", 5) == [0]
+
+    assert upload(shared, "b.pdf") == ["b.pdf"]
+    remap()
+    assert app._index_segments == ["", "000002"]
+    assert [doc["text"] for doc in app.all_documents_metadata] == FILES["a.pdf"] + FILES["b.pdf"]
+    assert app.vector_store.ntotal == app.stored_vectors.ntotal == 5
+    assert sorted(app.lexical_index.search("PN-00123 zebra", 5)) == [0, 4]
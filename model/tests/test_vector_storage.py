@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("prometheus_client")
+import app  # noqa: E402
+
+
+def test_vector_shards_take_spans_shards():
+    shards = app.VectorShards([np.arange(6, dtype=np.float16).reshape(3, 2), np.arange(6, 10, dtype=np.float16).reshape(2, 2)])
+    assert shards.ntotal == 5
+    rows = shards.take(np.array([4, 0, 2]))
+    assert rows.dtype == np.float32
+    np.testing.assert_array_equal(rows, [[8, 9], [0, 1], [4, 5]])
+
+
+def test_rescore_orders_shortlist_by_exact_distance():
+    vectors = app.VectorShards([np.array([[0, 0], [1, 0]], dtype=np.float32), np.array([[5, 5]], dtype=np.float32)])
+    queries = np.array([[0.9, 0], [4, 4]], dtype=np.float32)
+    shortlist = np.array([[0, 1, 2], [2, -1, -1]])
+    distances, ids = app.rescore(queries, shortlist, vectors, 2)
+    np.testing.assert_array_equal(ids, [[1, 0], [2, -1]])
+    np.testing.assert_allclose(distances, [[0.01, 0.81], [2, np.inf]], rtol=1e-5)
+
+
+def test_pq_falls_back_to_int8_and_reports_the_actual_index(monkeypatch):
+    faiss = pytest.importorskip("faiss")
+    vectors = np.random.default_rng(0).normal(size=(100, 384)).astype(np.float32)
+    index = app.new_vector_index(vectors, storage="pq")
+    assert isinstance(index, faiss.IndexScalarQuantizer)
+    index.add(vectors)
+    monkeypatch.setattr(app, "VECTOR_STORAGE", "pq")
+    monkeypatch.setattr(app, "vector_store", index)
+    monkeypatch.setattr(app, "stored_vectors", app.VectorShards([vectors.astype(np.float16)]))
+    report = app.vector_storage_report()
+    assert report["configured_mode"] == "pq"
+    assert report["index_type"] == "IndexScalarQuantizer"
+    assert report["index_bytes_per_vector"] == 384
+
+
+def test_cached_embeddings_are_keyed_by_dtype(monkeypatch):
+    monkeypatch.setattr(app, "CACHE_VECTOR_DTYPE", np.float32)
+    float32_path = app.cached_embeddings_path("abc")
+    monkeypatch.setattr(app, "CACHE_VECTOR_DTYPE", np.float16)
+    assert app.cached_embeddings_path("abc") != float32_path
+    assert app.cached_embeddings_path("abc").endswith("-float16.npy")
@@ -20,9 +20,13 @@ export default function ChatApp() {
   const mediaRecorderRef = useRef(null);
   const streamRef = useRef(null);
   const audioChunksRef = useRef([]);
+  const askControllerRef = useRef(null);
 
   const BASE = "http://localhost:5000";
 
+  // Abort an in-flight answer on unmount so the server stops generating
+  useEffect(() => () => askControllerRef.current?.abort(), []);
+
   useEffect(() => {
     if (chatMessagesRef.current) {
       chatMessagesRef.current.scrollTop = chatMessagesRef.current.scrollHeight;
@@ -94,41 +98,54 @@ export default function ChatApp() {
     const thinkingMessageIndex = messages.length + 1;
     setMessages(prev => [...prev, { sender: 'system', content: 'Thinking...', isStreaming: true }]);
 
+    // Only one answer streams at a time; aborting closes the connection and the server cancels generation
+    askControllerRef.current?.abort();
+    const controller = new AbortController();
+    askControllerRef.current = controller;
+
     try {
       const response = await fetch(`${BASE}/ask`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ question }),
+        signal: controller.signal,
       });
 
+      if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `Request failed with status ${response.status}`);
+      }
       if (!response.body) throw new Error('Streaming response not available.');
 
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = '';
+      let answer = '';
       let streamedContent = '';
       let sources = [];
 
+      // The response is newline-delimited JSON: a "sources" frame, "token" frames, then "done"
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
         buffer += decoder.decode(value, { stream: true });
-
-        const jsonMatch = buffer.match(/(\{.*\})\s*$/);
-        if (jsonMatch) {
-          try {
-            const parsed = JSON.parse(jsonMatch[0]);
-            if (parsed.type === "sources") {
-              sources = parsed.content;
-              buffer = buffer.substring(0, jsonMatch.index);
-            }
-          } catch (e) {
-            /* Incomplete JSON */
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const frame = JSON.parse(line);
+          if (frame.type === 'sources') {
+            sources = frame.content;
+          } else if (frame.type === 'token') {
+            answer += frame.content;
+          } else if (frame.type === 'error') {
+            throw new Error(frame.content);
           }
         }
 
-        streamedContent = buffer.replace(/``````/g, "").trim();
+        streamedContent = answer.replace(/``````/g, "").trim();
 
         setMessages(prev => {
           const newMessages = [...prev];
@@ -153,6 +170,15 @@ export default function ChatApp() {
         return newMessages;
       });
     } catch (error) {
+      if (error.name === 'AbortError') {
+        // Superseded by a newer question: keep whatever was streamed so far
+        setMessages(prev => {
+          const newMessages = [...prev];
+          newMessages[thinkingMessageIndex] = { ...newMessages[thinkingMessageIndex], isStreaming: false };
+          return newMessages;
+        });
+        return;
+      }
       setMessages(prev => {
         const newMessages = [...prev];
         newMessages[thinkingMessageIndex] = {
@@ -340,7 +366,22 @@ export default function ChatApp() {
                       <p className="text-xs text-gray-500 mb-2">Sources:</p>
                       <div className="space-y-1">
                         {msg.sources.map((source, i) => (
-                          <p key={i} className="text-xs text-gray-400">{source}</p>
+                          <div key={i} className="text-xs text-gray-400">
+                            <p>
+                              {source.source_filename}
+                              {source.timestamp_display ? ` (${source.timestamp_display})` : ` · page/chunk ${source.page_num}`}
+                            </p>
+                            {source.show_inline && source.thumbnail_url && (
+                              <a href={`${BASE}${source.image_url}`} target="_blank" rel="noreferrer">
+                                <img
+                                  src={`${BASE}${source.thumbnail_url}`}
+                                  alt={source.source_filename}
+                                  loading="lazy"
+                                  className="mt-1 max-w-xs rounded border border-zinc-800"
+                                />
+                              </a>
+                            )}
+                          </div>
                         ))}
                       </div>
                     </div>